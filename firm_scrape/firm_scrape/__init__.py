@@ -1,15 +1,15 @@
-import csv
-import io
+import json
 import logging
+import queue
 import re
-import sqlite3
 import time
+import uuid
 from datetime import datetime
 from urllib import parse
 from datetime import timedelta
 from functools import update_wrapper
 from flask import Flask, g, render_template, request, make_response, current_app
-from firm_scrape.models import FirmJob, FirmType, PersonalProfile
+from firm_scrape.models import FirmJob, FirmType, JobStatus, PersonalProfile
 import flask_login
 import requests
 from firm_scrape.database import db_session
@@ -18,11 +18,18 @@ import flask
 import undetected_chromedriver as uc  # present in the docker container
 from flask import Flask, g, render_template, request
 from flask_cors import CORS
+from sqlalchemy import func
 from selenium.webdriver.common.by import By
 
 from .util import crossdomain
+from .exports import csv_response, iter_emails_csv, iter_query_csv, profiles_sql
+from .jobqueue import submit_job
+from .listing import count_results, jobs_to_dicts, list_jobs, parse_job_filters
+from .constants import EVENTS_KEEPALIVE_SECONDS, RESCRAPE_AFTER_DAYS
+from .events import event_bus
+from .metrics import metrics
+from .progress import progress_relay
 from firm_scrape.database import db_session
-from .constants import NAMES_FILE
 
 
 app = Flask(__name__)
@@ -98,66 +105,59 @@ def unauthorized_handler():
 
 @app.route("/jobs/<id>", methods=["GET"])
 def download_job_report(id):
-    con = sqlite3.connect("/database.db")
-
-    outfile = io.StringIO("", newline="")
-    outcsv = csv.writer(outfile)
-
-    cursor = con.execute("select * from jobs where id = ?", (id,))
-    outcsv.writerows(cursor.fetchall())
-
-    cursor = con.execute("select * from profiles where job_id = ?", (id,))
-    outcsv.writerows(cursor.fetchall())
-
-    outfile.flush()
-    outfile.seek(0)
-    resp = flask.Response(outfile.read())
-    resp.headers[
-        "Content-Disposition"
-    ] = f'attachment; filename="firm_scrape-job-{str(id)}.csv"'
-    resp.headers["Content-Type"] = "text/plain; charset=utf-8"
-
-    return resp
+    chunks = iter_query_csv(
+        [
+            ("select * from jobs where id = ?", (id,)),
+            (profiles_sql("where job_id = ?"), (id,)),
+        ]
+    )
+    return csv_response(
+        chunks, f"firm_scrape-job-{str(id)}.csv", request.args.get("gzip") == "1"
+    )
 
 
 @app.route("/jobs/<id>/emails", methods=["GET"])
 def download_all_job_emails(id):
-    con = sqlite3.connect("/database.db")
-
-    outfile = io.StringIO("", newline="")
-    outcsv = csv.writer(outfile)
-
-    cursor = con.execute("select emails from profiles where job_id = ?", (id,))
-
-    empty = True
-
-    for emails in cursor.fetchall():
-        if emails[0]:
-            for email in emails[0].split(";"):
-                outcsv.writerow([email])
-                empty = False
-    if empty:
-        outcsv.writerow(["No emails found!"])
-
-    outfile.flush()
-    outfile.seek(0)
-    resp = flask.Response(outfile.read())
-    resp.headers[
-        "Content-Disposition"
-    ] = f'attachment; filename="firm_scrape-job-{str(id)}-emails.csv"'
-    resp.headers["Content-Type"] = "text/plain; charset=utf-8"
-
-    return resp
+    return csv_response(
+        iter_emails_csv(id),
+        f"firm_scrape-job-{str(id)}-emails.csv",
+        request.args.get("gzip") == "1",
+    )
 
 
 @app.route("/jobs", methods=["GET"])
 @flask_login.login_required
 def view_all_jobs():
-    context = {"jobs": FirmJob.query.all()}
-    print(context)
+    filters = parse_job_filters(request.args)
+    jobs, next_after = list_jobs(**filters)
+    context = {
+        "jobs": jobs,
+        "counts": count_results([job.id for job in jobs]),
+        "next_after": next_after,
+        "filters": filters,
+        # the filters and sort, for the page links to carry over
+        "page_args": {
+            key: value
+            for key, value in filters.items()
+            if value is not None and key != "after"
+        },
+        "batch": filters["batch"],
+        "statuses": [status.name for status in JobStatus],
+        "firm_types": [firm_type.name for firm_type in FirmType],
+    }
     return render_template("jobs.html", **context)
 
 
+@app.route("/jobs/list", methods=["GET"])
+@flask_login.login_required
+def view_jobs_list():
+    """
+    JSON version of /jobs: one page of jobs with their counts, and the after cursor of the next page.
+    """
+    jobs, next_after = list_jobs(**parse_job_filters(request.args))
+    return flask.jsonify({"jobs": jobs_to_dicts(jobs), "next_after": next_after})
+
+
 @app.route("/", methods=["GET"])
 def landing_view():
     return render_template("index.html")
@@ -167,48 +167,128 @@ def landing_view():
 @crossdomain(origin="*")
 @flask_login.login_required
 def add_view():
+    """
+    Queues the submitted jobs for the workers (see worker.py) and returns their ids right away. Domains with fresh results are not scraped again, see submit_job.
+    """
     if request.method == "POST":
         content = request.json
-        start_time = datetime.now()
+        batch_id = uuid.uuid4().hex
+        max_age_days = content.get("max_age_days") or RESCRAPE_AFTER_DAYS
+        max_age = timedelta(days=float(max_age_days))
+        job_ids = []
         for domain_list, firm_type, limit in content["jobs"]:
             limit = float("inf") if limit == "" else int(limit)
             for domain in domain_list.splitlines():
-                firm_job = FirmJob(domain, FirmType[firm_type.upper()], limit)
-                db_session.add(firm_job)
-                try:
-                    db_session.commit()
-                except:
-                    db_session.rollback()
-
-        for firm_job in FirmJob.query.all():
-            firm_job.execute(name_set)
-            db_session.commit()
-
-        csv_file_text = db2csv()
-
-        resp = flask.Response(csv_file_text)
-        resp.headers["Content-Disposition"] = f"attachment; {str(start_time)}.csv"
-        return resp
+                domain = domain.strip()
+                if not domain:
+                    continue
+                firm_job = submit_job(
+                    domain, FirmType[firm_type.upper()], limit, batch_id, max_age
+                )
+                job_ids.append(firm_job.id)
+
+        return flask.jsonify({"batch": batch_id, "jobs": job_ids})
     else:
-        return render_template("add.html")
+        return render_template("add.html", rescrape_after_days=RESCRAPE_AFTER_DAYS)
 
 
-def db2csv():
-    con = sqlite3.connect("/database.db")
-    outfile = io.StringIO("", newline="")
-    outcsv = csv.writer(outfile)
-
-    cursor = con.execute("select * from profiles")
+@app.route("/jobs/status", methods=["GET"])
+@flask_login.login_required
+def view_jobs_status():
+    """
+    Progress of the jobs in the comma separated ids argument, polled by jobs.html and add.html.
+    """
+    ids = [int(id) for id in request.args.get("ids", "").split(",") if id.isdigit()]
+    jobs = FirmJob.query.filter(FirmJob.id.in_(ids)).all()
+    return flask.jsonify({"jobs": jobs_to_dicts(jobs)})
 
-    outcsv.writerows(cursor.fetchall())
 
-    cursor = con.execute("select * from jobs")
+@app.route("/jobs/events", methods=["GET"])
+@flask_login.login_required
+def stream_job_events():
+    """
+    Server-sent events with the state of every job as it changes, optionally only those in the comma separated ids argument. Used by jobs.html instead of polling /jobs/status.
+    """
+    ids = {int(id) for id in request.args.get("ids", "").split(",") if id.isdigit()}
+
+    def stream():
+        subscriber = event_bus.subscribe("jobs")
+        progress_relay.start()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if not ids or event["id"] in ids:
+                    yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe("jobs", subscriber)
+
+    return flask.Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/jobs/<id>/timings", methods=["GET"])
+@flask_login.login_required
+def view_job_timings(id):
+    """
+    Where the last run of a job spent its time, by phase, with its WebDriver round trips and fetched bytes.
+    """
+    firm_job = FirmJob.query.filter_by(id=id).one_or_none()
+    if firm_job is None:
+        flask.abort(404)
+    return flask.jsonify(json.loads(firm_job.timings) if firm_job.timings else {})
+
+
+@app.route("/metrics", methods=["GET"])
+def view_metrics():
+    """
+    The web app's metrics, plus the number of jobs in each state, in the Prometheus text format. Workers serve the metrics of the jobs they run themselves, see worker.py.
+    """
+    lines = ["# TYPE firm_scrape_jobs gauge"]
+    for status, count in (
+        db_session.query(FirmJob.status, func.count(FirmJob.id))
+        .group_by(FirmJob.status)
+        .all()
+    ):
+        lines.append(
+            f'firm_scrape_jobs{{status="{status.name if status else None}"}} {count}'
+        )
+    resp = flask.Response(metrics.render() + "\n".join(lines) + "\n")
+    resp.headers["Content-Type"] = "text/plain; version=0.0.4"
+    return resp
 
-    outcsv.writerows(cursor.fetchall())
 
-    outfile.flush()
-    outfile.seek(0)
-    return outfile.read()
+@app.route("/export", methods=["GET"])
+@flask_login.login_required
+def download_all():
+    batch_id = request.args.get("batch")
+    if batch_id:
+        queries = [
+            (
+                profiles_sql(
+                    "where job_id in (select job_id from batch_jobs where batch_id = ?)"
+                ),
+                (batch_id,),
+            ),
+            (
+                "select * from jobs where id in (select job_id from batch_jobs where batch_id = ?)",
+                (batch_id,),
+            ),
+        ]
+    else:
+        queries = [(profiles_sql(), ()), ("select * from jobs", ())]
+    return csv_response(
+        iter_query_csv(queries),
+        f"firm_scrape-{datetime.now()}.csv",
+        request.args.get("gzip") == "1",
+    )
 
 
 @app.teardown_appcontext
@@ -216,17 +296,6 @@ def shutdown_session(exception=None):
     db_session.remove()
 
 
-@app.before_first_request
-def setup_nameset():
-    global name_set
-    name_set = set()
-    print("Initializing nameset.")
-    with open(NAMES_FILE, "r") as f:
-        for line in f.read().splitlines():
-            name_set.add(line)
-    print("Finished initializing nameset.")
-
-
 @app.before_first_request
 def setup_logging():
     logging.basicConfig(level=20)
@@ -0,0 +1,254 @@
+"""
+Directories backed by a JSON API. Chrome's performance log records the network traffic of the team page, so the XHR or fetch response holding the listing can be found, and the rest of the listing fetched by paging that request over plain HTTP, FETCH_PER_HOST pages at a time, instead of clicking through it in the browser.
+"""
+
+import base64
+import json
+import logging
+import re
+from urllib import parse
+
+from .constants import FETCH_PER_HOST
+from .fetch import fetch_pages
+from .util import is_name
+
+# Query parameters that select a page by number, or by the index of its first record.
+PAGE_PARAMS = {"page", "pagenumber", "page_number", "pageindex", "pagenum", "pg", "p"}
+OFFSET_PARAMS = {"offset", "start", "skip", "from"}
+
+EMAIL_REGEX = re.compile(r"[^@\s]+@[^@\s]+\.[a-zA-Z]{2,}")
+FIRST_NAME_KEY = re.compile(r"first_?name|given_?name", re.IGNORECASE)
+LAST_NAME_KEY = re.compile(r"last_?name|family_?name|surname", re.IGNORECASE)
+
+
+def discard_performance_log(driver):
+    """
+    Reads and drops the entries logged so far, so the next capture_json_responses only sees what follows.
+    """
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass  # drivers started without performance logging
+
+
+def capture_json_responses(driver):
+    """
+    The url and parsed body of every JSON response to a GET made by XHR or fetch since the performance log was last read.
+    """
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logging.info(f"No performance log: {e}")
+        return []
+
+    methods = {}
+    received = []
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        params = message.get("params", {})
+        if message.get("method") == "Network.requestWillBeSent":
+            methods[params["requestId"]] = params["request"]["method"]
+        elif message.get("method") == "Network.responseReceived":
+            if params.get("type") in ("XHR", "Fetch") and "json" in params[
+                "response"
+            ].get("mimeType", ""):
+                received.append((params["requestId"], params["response"]["url"]))
+
+    responses = []
+    for request_id, url in received:
+        if methods.get(request_id, "GET") != "GET":
+            continue  # only GETs can be paged by rewriting the url
+        try:
+            body = driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": request_id}
+            )
+            text = body["body"]
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text).decode("utf-8", "replace")
+            responses.append((url, json.loads(text)))
+        except Exception as e:
+            logging.info(f"Could not read the response of {url}: {e}")
+    return responses
+
+
+def find_listing_api(responses, name_set):
+    """
+    The response among responses, as captured by capture_json_responses, that looks most like a directory listing. Returns (url, path, records), path being the keys that lead from the document to its records, or None.
+    """
+    best = None
+    best_score = 1  # at least two people
+    for url, data in responses:
+        for path, records in _record_lists(data, []):
+            score = named_count(records, name_set)
+            if score > best_score:
+                best = (url, path, records)
+                best_score = score
+    return best
+
+
+def named_count(records, name_set):
+    """
+    The number of records that name a person.
+    """
+    return sum(1 for record in records if _record_name(record, name_set) is not None)
+
+
+def get_records(data, path):
+    """
+    The records at path in data, a page of the listing, or [] if the page does not have them.
+    """
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return []
+    if not isinstance(data, list):
+        return []
+    return [record for record in data if isinstance(record, dict)]
+
+
+def api_page_url(url, index, page_size):
+    """
+    url, the request of the captured page, moved on by index pages: by its page parameter, or by its offset parameter in steps of page_size. Returns None if it has neither.
+    """
+    parsed = parse.urlparse(url)
+    query = parse.parse_qsl(parsed.query, keep_blank_values=True)
+    for position, (key, value) in enumerate(query):
+        if not value.isdigit():
+            continue
+        if key.lower() in PAGE_PARAMS:
+            query[position] = (key, str(int(value) + index))
+            break
+        if key.lower() in OFFSET_PARAMS:
+            query[position] = (key, str(int(value) + index * page_size))
+            break
+    else:
+        return None
+    return parse.urlunparse(parsed._replace(query=parse.urlencode(query)))
+
+
+def record_preview(record, base_url):
+    """
+    A record as the [hrefs, texts] of a profile preview, so it makes a PersonalProfile the same way one harvested from the page does: links and email addresses become hrefs, the other values texts. A name split into first and last name fields is joined and leads the texts.
+    """
+    hrefs = []
+    texts = []
+    full_name = _full_name(record)
+    if full_name is not None:
+        # the name's parts alone would be taken for names too
+        texts.append(full_name)
+        record = {
+            key: value
+            for key, value in record.items()
+            if not (FIRST_NAME_KEY.fullmatch(key) or LAST_NAME_KEY.fullmatch(key))
+        }
+    for value in _scalars(record):
+        if EMAIL_REGEX.fullmatch(value):
+            hrefs.append(f"mailto:{value}")
+        elif value.startswith(("http://", "https://", "mailto:")) or (
+            value.startswith("/") and " " not in value
+        ):
+            hrefs.append(parse.urljoin(base_url, value))
+        else:
+            texts.append(value)
+    return [hrefs, texts]
+
+
+def iter_listing_api(url, path, records, base_url):
+    """
+    Yields (url, previews) for the pages of the listing API at url, records being those of its first page: that page, then the following ones fetched over plain HTTP, FETCH_PER_HOST at a time, until a batch has no new records. Records become previews by record_preview against base_url, and records already yielded are dropped.
+    """
+    page_size = len(records)
+    seen_records = set()
+    pages = [(url, records)]
+    page_index = 0
+    exhausted = False
+    while True:
+        found = 0
+        for page_url, records in pages:
+            page_index += 1
+            previews = []
+            for record in records:
+                key = json.dumps(record, sort_keys=True, default=str)
+                if key not in seen_records:
+                    seen_records.add(key)
+                    previews.append(record_preview(record, base_url))
+            found += len(previews)
+            yield page_url, previews
+        if found == 0 or exhausted:
+            return
+
+        page_urls = [
+            api_page_url(url, index, page_size)
+            for index in range(page_index, page_index + FETCH_PER_HOST)
+        ]
+        if page_urls[0] is None:
+            return  # not paged, the listing came whole
+        bodies = fetch_pages(page_urls, content_type="json")
+        pages = []
+        for page_url in page_urls:
+            try:
+                records = get_records(json.loads(bodies.get(page_url)), path)
+            except (TypeError, ValueError):
+                records = []
+            if not records:
+                exhausted = True  # past the last page
+                break
+            pages.append((page_url, records))
+
+
+def _record_lists(data, path):
+    """
+    Yields (path, records) for every list of two or more objects in data.
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _record_lists(value, path + [key])
+    elif isinstance(data, list):
+        records = [item for item in data if isinstance(item, dict)]
+        if len(records) >= 2:
+            yield path, records
+        else:
+            for index, item in enumerate(data):
+                yield from _record_lists(item, path + [index])
+
+
+def _record_name(record, name_set):
+    full_name = _full_name(record)
+    if full_name is not None and is_name(full_name, name_set):
+        return full_name
+    for value in record.values():
+        if isinstance(value, str) and is_name(value.strip(), name_set):
+            return value
+    return None
+
+
+def _full_name(record):
+    """
+    The name of a record that splits it into first and last name fields, or None.
+    """
+    first = last = None
+    for key, value in record.items():
+        if not isinstance(value, str):
+            continue
+        if FIRST_NAME_KEY.fullmatch(key):
+            first = value
+        elif LAST_NAME_KEY.fullmatch(key):
+            last = value
+    if first and last:
+        return f"{first} {last}"
+    return None
+
+
+def _scalars(data):
+    if isinstance(data, dict):
+        for value in data.values():
+            yield from _scalars(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _scalars(value)
+    elif isinstance(data, str):
+        if data.strip():
+            yield data.strip()
+    elif data is not None and not isinstance(data, bool):
+        yield str(data)
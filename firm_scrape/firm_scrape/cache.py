@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+import requests
+from usp.objects.sitemap import IndexWebsiteSitemap, InvalidSitemap
+from usp.tree import sitemap_tree_for_homepage
+
+from .constants import (
+    CACHE_DIR,
+    FETCH_HEADERS,
+    FETCH_TIMEOUT,
+    RECIPE_CACHE_TTL,
+    RECIPE_VERSION,
+    SITEMAP_CACHE_TTL,
+    TEAM_URL_CACHE_TTL,
+)
+
+
+class DomainCache:
+    """
+    On-disk JSON cache of per-domain discovery results, one file per domain. Entries are fresh for ttl seconds; after that, callers may revalidate them against the HTTP validators stored alongside the value instead of discovering again.
+    """
+
+    def __init__(self, kind, ttl, cache_dir=CACHE_DIR):
+        self.kind = kind
+        self.ttl = ttl
+        self.directory = os.path.join(cache_dir, kind)
+
+    def _path(self, domain):
+        name = hashlib.sha1(domain.lower().encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, domain):
+        """
+        Returns the cached value for domain if it is fresh, or can be revalidated with its stored validators. Otherwise returns None.
+        """
+        try:
+            with open(self._path(domain), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["stored"] < self.ttl:
+            return entry["value"]
+        if entry["validators"] and revalidate(entry["validators"]):
+            logging.info(f"Info in {domain}: Revalidated cached {self.kind}.")
+            self.put(domain, entry["value"], entry["validators"])
+            return entry["value"]
+        return None
+
+    def put(self, domain, value, validators=None):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "domain": domain,
+            "stored": time.time(),
+            "value": value,
+            "validators": validators or {},
+        }
+        # write then rename, so concurrent readers never see a partial file
+        path = self._path(domain)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, domain):
+        try:
+            os.remove(self._path(domain))
+        except OSError:
+            pass
+
+
+def get_validators(urls):
+    """
+    The ETag and Last-Modified headers of each url, for those that send either.
+    """
+    validators = {}
+    for url in urls:
+        try:
+            response = requests.head(
+                url, headers=FETCH_HEADERS, timeout=FETCH_TIMEOUT, allow_redirects=True
+            )
+        except requests.RequestException as e:
+            logging.info(f"Failed to get validators for {url}: {e!r}")
+            continue
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.ok and (etag or last_modified):
+            validators[url] = {"etag": etag, "last_modified": last_modified}
+    return validators
+
+
+def revalidate(validators):
+    """
+    Conditionally requests every validated url. True only if none of them changed.
+    """
+    for url, validator in validators.items():
+        headers = dict(FETCH_HEADERS)
+        if validator["etag"]:
+            headers["If-None-Match"] = validator["etag"]
+        if validator["last_modified"]:
+            headers["If-Modified-Since"] = validator["last_modified"]
+        try:
+            response = requests.head(
+                url, headers=headers, timeout=FETCH_TIMEOUT, allow_redirects=True
+            )
+        except requests.RequestException:
+            return False
+        if response.status_code == 304:
+            continue
+        # servers that ignore conditional headers still report the validators
+        if not response.ok or (
+            response.headers.get("ETag") != validator["etag"]
+            or response.headers.get("Last-Modified") != validator["last_modified"]
+        ):
+            return False
+    return True
+
+
+sitemap_cache = DomainCache("sitemaps", SITEMAP_CACHE_TTL)
+team_url_cache = DomainCache("team_urls", TEAM_URL_CACHE_TTL)
+recipe_cache = DomainCache("recipes", RECIPE_CACHE_TTL)
+
+
+def get_recipe(domain):
+    """
+    The recipe a successful earlier run learned for the domain, or {} if there is none of the current RECIPE_VERSION. A recipe holds the winning strategy ("api", "static", "team" or "sitemap") and whatever that strategy discovered: team_url, profile_selector, the search_configs that found profiles, the pagination style ("url" or "click"), and the api_url and api_path of a listing API. Each field is validated against the live site when replayed, and learned again if it no longer holds.
+    """
+    recipe = recipe_cache.get(domain)
+    if recipe is None or recipe.get("version") != RECIPE_VERSION:
+        return {}
+    return recipe
+
+
+def put_recipe(domain, recipe):
+    recipe_cache.put(domain, dict(recipe, version=RECIPE_VERSION))
+
+
+def get_sitemap_page_urls(domain, homepage_url):
+    """
+    Every page url listed in the domain's sitemaps, from the cache when possible. Otherwise the sitemaps are crawled and cached, validated by the robots.txt and sitemap files they were read from.
+    """
+    page_urls = sitemap_cache.get(domain)
+    if page_urls is not None:
+        logging.info(f"Info in {domain}: Using {len(page_urls)} cached sitemap urls.")
+        return page_urls
+
+    tree = sitemap_tree_for_homepage(homepage_url)
+    page_urls = [page.url for page in tree.all_pages()]
+
+    sitemap_urls = []
+    stack = [tree]
+    while stack:
+        sitemap = stack.pop()
+        if not isinstance(sitemap, (IndexWebsiteSitemap, InvalidSitemap)):
+            sitemap_urls.append(sitemap.url)
+        stack.extend(getattr(sitemap, "sub_sitemaps", []))
+    sitemap_cache.put(domain, page_urls, get_validators(sitemap_urls))
+    return page_urls
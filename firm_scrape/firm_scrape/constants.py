@@ -1,3 +1,5 @@
+import os
+
 LAW_FIRM_KEY_TITLES = ["partner", "venture capital", "private equity"]
 
 LAW_FIRM_KEY_PRACTICES = [
@@ -26,4 +28,90 @@ NAME_LIMIT = 10
 LAW_FIRM_PRACTICES_FILTER_BOX_KEYWORDS = ["practice"]
 
 NAMES_FILE = "./names_all.txt"
+# Compact, memory-mapped form of NAMES_FILE, built on first use (see names.py).
+NAMES_INDEX_FILE = "./names_all.idx"
 NAME_LIMIT = 10
+
+# Upper bound on FirmJobs (and therefore Chrome instances) running at once.
+MAX_CONCURRENT_JOBS = int(os.environ.get("FIRM_SCRAPE_MAX_JOBS", os.cpu_count() or 1))
+
+# Pooled webdrivers are quit and replaced after this many leases, or once the
+# Chrome process tree grows past this many megabytes.
+DRIVER_MAX_USES = 50
+DRIVER_MAX_MEMORY_MB = 1500
+
+# Search configurations of a team page (combinations of select options) are
+# run on up to SEARCH_CONFIG_DRIVERS extra pooled drivers, when the pool has
+# them idle. Once a configuration has found profiles, the search stops after
+# SEARCH_CONFIG_PATIENCE configurations in a row find none that are new.
+SEARCH_CONFIG_DRIVERS = 3
+SEARCH_CONFIG_PATIENCE = 4
+
+# Page settling: a page counts as settled once the network and the DOM have
+# been quiet for WAIT_QUIET_MS, giving up after WAIT_TIMEOUT seconds.
+WAIT_QUIET_MS = 500
+WAIT_TIMEOUT = 15
+
+# Job queue: a worker must renew its lease on a running job within
+# JOB_LEASE_SECONDS, or the job is handed to another worker. Jobs are tried at
+# most JOB_MAX_ATTEMPTS times. Idle workers poll every JOB_POLL_SECONDS.
+JOB_LEASE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_SECONDS = 5
+
+# Resubmitted domains reuse their last successful results unless those are
+# older than this many days. /add accepts a max_age_days override.
+RESCRAPE_AFTER_DAYS = 30
+
+DATABASE_PATH = os.environ.get("FIRM_SCRAPE_DATABASE", "/database.db")
+
+# SQLite connection settings. WAL lets the web app read while workers write;
+# with WAL, synchronous=NORMAL only risks the last commits on power loss. A
+# connection waits up to SQLITE_BUSY_TIMEOUT_MS for locks instead of failing
+# with "database is locked".
+SQLITE_JOURNAL_MODE = "WAL"
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+# Rows fetched per round trip when streaming CSV exports.
+EXPORT_CHUNK_SIZE = 1000
+
+# Jobs shown per page of /jobs.
+JOBS_PAGE_SIZE = 50
+
+# Live progress (see progress.py). Workers write the progress of their jobs
+# at most every PROGRESS_WRITE_SECONDS; the web app reads it back every
+# PROGRESS_POLL_SECONDS while a /jobs page is open.
+PROGRESS_WRITE_SECONDS = 2
+PROGRESS_POLL_SECONDS = 1
+EVENTS_KEEPALIVE_SECONDS = 15
+
+# Workers serve their metrics (see metrics.py) on this port, 0 disables it.
+# The web app serves its own at /metrics.
+WORKER_METRICS_PORT = int(os.environ.get("FIRM_SCRAPE_METRICS_PORT", 9100))
+
+# Plain HTTP fetching of profile pages (see fetch.py).
+FETCH_MAX_CONNECTIONS = 50
+FETCH_PER_HOST = 8
+FETCH_TIMEOUT = 20
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+# The sitemap strategy fetches profile pages SITEMAP_BATCH_SIZE at a time,
+# starting at most SITEMAP_REQUESTS_PER_SECOND requests per second per domain.
+SITEMAP_BATCH_SIZE = 50
+SITEMAP_REQUESTS_PER_SECOND = 5
+
+# On-disk cache of per-domain discovery results (see cache.py). Entries older
+# than their TTL (in seconds) are revalidated with ETag/Last-Modified.
+CACHE_DIR = os.environ.get("FIRM_SCRAPE_CACHE_DIR", "./cache")
+SITEMAP_CACHE_TTL = 7 * 24 * 60 * 60
+TEAM_URL_CACHE_TTL = 30 * 24 * 60 * 60
+
+# Recipes (see cache.py) record how a domain was scraped, so its next run can
+# skip discovery. Bump RECIPE_VERSION whenever what a recipe field means
+# changes; recipes of other versions are ignored and learned again.
+RECIPE_VERSION = 1
+RECIPE_CACHE_TTL = 90 * 24 * 60 * 60
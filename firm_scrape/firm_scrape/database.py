@@ -1,15 +1,71 @@
-from sqlalchemy import create_engine
+import sqlite3
+
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+from .constants import (
+    DATABASE_PATH,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+)
+
 # engine = create_engine('sqlite:////tmp/test.db')
-engine = create_engine("sqlite:////database.db")
+engine = create_engine(f"sqlite:///{DATABASE_PATH}")
+
+
+def configure_connection(con):
+    """
+    Applies the SQLite settings every connection should use, ORM or raw sqlite3 alike. journal_mode is stored in the database file, the others are per connection.
+    """
+    cursor = con.cursor()
+    cursor.execute(f"pragma busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"pragma journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"pragma synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    configure_connection(dbapi_connection)
+
+
+def connect():
+    """
+    A raw sqlite3 connection to the database, for streaming reads outside the ORM.
+    """
+    con = sqlite3.connect(DATABASE_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    configure_connection(con)
+    return con
+
+
 db_session = scoped_session(
     sessionmaker(autocommit=False, autoflush=False, bind=engine)
 )
 Base = declarative_base()
 Base.query = db_session.query_property()
 
+# Backfills for columns that migrate() adds to databases created by older
+# versions. Each statement must be safe to run repeatedly.
+BACKFILLS = [
+    "update jobs set status = 'DONE' where status is null and completed",
+    "update jobs set status = 'PENDING' where status is null",
+    "update jobs set attempts = 0 where attempts is null",
+    "update jobs set result_watermark = "
+    "(select max(id) from profiles where job_id = jobs.id) "
+    "where result_watermark is null and status = 'DONE'",
+]
+
+# Columns that older versions stored contact points in, joined with ";", and
+# the contact_points kind each is split into. migrate() moves their contents
+# to contact_points and clears them, so this is a no-op once done.
+LEGACY_CONTACT_COLUMNS = {
+    "emails": "EMAIL",
+    "linkedins": "LINKEDIN",
+    "others": "OTHER",
+}
+
 
 def init_db():
     # import all modules here that might define models so that
@@ -18,3 +74,67 @@ def init_db():
     import firm_scrape.models
 
     Base.metadata.create_all(bind=engine)
+    migrate()
+
+
+def migrate():
+    """
+    Brings a database created by an older version up to date. create_all only creates missing tables, so add any missing columns and indexes here.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as con:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    con.execute(
+                        text(
+                            f"alter table {table.name} add column {column.name} {column_type}"
+                        )
+                    )
+            for index in table.indexes:
+                index.create(con, checkfirst=True)
+        for backfill in BACKFILLS:
+            con.execute(text(backfill))
+        profile_columns = {
+            column["name"] for column in inspector.get_columns("profiles")
+        }
+        for column, kind in LEGACY_CONTACT_COLUMNS.items():
+            if column in profile_columns:
+                migrate_legacy_contacts(con, column, kind)
+        job_columns = {column["name"] for column in inspector.get_columns("jobs")}
+        if "batch_id" in job_columns:
+            # jobs.batch_id held only the latest submission, see BatchJob
+            con.execute(
+                text(
+                    "insert or ignore into batch_jobs (batch_id, job_id) "
+                    "select batch_id, id from jobs where batch_id is not null"
+                )
+            )
+            con.execute(
+                text("update jobs set batch_id = null where batch_id is not null")
+            )
+
+
+def migrate_legacy_contacts(con, column, kind):
+    con.execute(
+        text(
+            f"""
+            with recursive split(profile_id, value, rest) as (
+                select id, '', {column} || ';' from profiles
+                where {column} is not null and {column} != ''
+                union all
+                select
+                    profile_id,
+                    substr(rest, 1, instr(rest, ';') - 1),
+                    substr(rest, instr(rest, ';') + 1)
+                from split where rest != ''
+            )
+            insert or ignore into contact_points (profile_id, kind, value)
+            select profile_id, :kind, value from split where value != ''
+            """
+        ),
+        {"kind": kind},
+    )
+    con.execute(text(f"update profiles set {column} = null where {column} != ''"))
@@ -0,0 +1,303 @@
+import re
+from html.parser import HTMLParser
+
+# Serializes every element of the page in document order as
+# [tag, class attribute, parent index, text, href], where text is the rendered
+# innerText for elements with a text node child (what //*[text()] matched)
+# and null otherwise, and href is only set on anchors.
+SNAPSHOT_SCRIPT = """
+const records = [];
+const indices = new Map();
+const walker = document.createTreeWalker(document.documentElement, NodeFilter.SHOW_ELEMENT);
+for (let el = walker.currentNode; el; el = walker.nextNode()) {
+    indices.set(el, records.length);
+    const parent = el.parentElement ? indices.get(el.parentElement) : -1;
+    let text = null;
+    for (const child of el.childNodes) {
+        if (child.nodeType === Node.TEXT_NODE) {
+            text = el.getClientRects().length > 0 ? el.innerText : "";
+            break;
+        }
+    }
+    const tag = el.tagName.toLowerCase();
+    records.push([
+        tag,
+        el.getAttribute("class") || "",
+        parent === undefined ? -1 : parent,
+        text,
+        tag === "a" ? el.getAttribute("href") : null,
+    ]);
+}
+return records;
+"""
+
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+
+# An open element of one of these tags is closed by the start of the key tag,
+# as browsers do for end tags that may be left out.
+IMPLIED_END_TAGS = {
+    "li": {"li"},
+    "dt": {"dt", "dd"},
+    "dd": {"dt", "dd"},
+    "tr": {"tr", "td", "th"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "option": {"option"},
+}
+
+# Text under these is never rendered, so it has no innerText.
+HIDDEN_TAGS = {"head", "script", "style", "noscript", "template", "title"}
+
+# innerText puts line breaks around these.
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "br",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "section",
+    "table",
+    "tr",
+    "ul",
+}
+
+
+class DomNode:
+    __slots__ = (
+        "index",
+        "tag",
+        "classes",
+        "parent",
+        "children",
+        "text",
+        "href",
+        "anchor_count",
+        "inner_text",
+    )
+
+    def __init__(self, index, tag, classes, parent, text, href, inner_text=None):
+        self.index = index
+        self.tag = tag
+        self.classes = classes
+        self.parent = parent
+        self.children = []
+        self.text = text  # None unless the element has a text node child
+        self.href = href
+        self.anchor_count = 0  # number of descendant anchors
+        # innerText of any element, only known for snapshots of static HTML
+        self.inner_text = inner_text
+
+    def __repr__(self):
+        return f"<{self.tag} #{self.index}>"
+
+
+class DomSnapshot:
+    """
+    A compact, browser independent copy of a page's element tree, so structural heuristics can run as plain Python instead of one WebDriver round trip per step.
+    """
+
+    def __init__(self, records):
+        self.nodes = []
+        for index, (tag, class_attr, parent_index, text, href, *rest) in enumerate(
+            records
+        ):
+            parent = self.nodes[parent_index] if parent_index >= 0 else None
+            node = DomNode(index, tag, class_attr.split(), parent, text, href, *rest)
+            if parent is not None:
+                parent.children.append(node)
+            self.nodes.append(node)
+        # Children always come after their parent, so one reverse pass
+        # accumulates the descendant anchor counts.
+        for node in reversed(self.nodes):
+            if node.parent is not None:
+                node.parent.anchor_count += node.anchor_count + (node.tag == "a")
+
+    @classmethod
+    def from_driver(cls, driver):
+        return cls(driver.execute_script(SNAPSHOT_SCRIPT))
+
+    @classmethod
+    def from_html(cls, html):
+        parser = _SnapshotParser()
+        parser.feed(html)
+        parser.close()
+        return cls(parser.get_records())
+
+    @property
+    def root(self):
+        return self.nodes[0] if self.nodes else None
+
+    def text_nodes(self):
+        """
+        The nodes with a text node child, in document order.
+        """
+        return [node for node in self.nodes if node.text is not None]
+
+    def select(self, selector):
+        """
+        The nodes matching selector, in document order, like querySelectorAll. Supports the selectors derive_profile_selector produces: compounds of a tag and/or classes, joined by child combinators.
+        """
+        compounds = [_parse_compound(part) for part in selector.split(">")]
+        return [node for node in self.nodes if _matches(node, compounds)]
+
+
+def _parse_compound(compound):
+    tag, *classes = compound.strip().split(".")
+    return tag.lower() or None, [token for token in classes if token]
+
+
+def _matches(node, compounds):
+    for tag, classes in reversed(compounds):
+        if node is None:
+            return False
+        if tag is not None and tag != "*" and node.tag != tag:
+            return False
+        if any(token not in node.classes for token in classes):
+            return False
+        node = node.parent
+    return True
+
+
+class _SnapshotParser(HTMLParser):
+    """
+    Builds snapshot records from static HTML, approximating innerText from the markup since nothing is rendered. Unlike browser records, these carry the innerText of every element.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tags = []
+        self.classes = []
+        self.parents = []
+        self.hrefs = []
+        self.has_text = []
+        self.hidden = []
+        # text in document order, None marking a line break. Each element's
+        # innerText is rebuilt from the pieces between its start and end.
+        self.pieces = []
+        self.starts = []
+        self.ends = []
+        self.stack = []
+
+    def handle_starttag(self, tag, attrs):
+        if not self.tags and tag != "html":
+            self.handle_starttag("html", [])  # browsers supply a missing root
+        implied = IMPLIED_END_TAGS.get(tag, set())
+        if tag in BLOCK_TAGS:
+            implied = implied | {"p"}
+        while self.stack and self.tags[self.stack[-1]] in implied:
+            self.handle_endtag(self.tags[self.stack[-1]])
+        if tag == "tr" and self.stack and self.tags[self.stack[-1]] == "table":
+            self.handle_starttag("tbody", [])  # and a missing table body
+        attrs = dict(attrs)
+        index = len(self.tags)
+        # stray elements after the root was closed still belong to it
+        parent = self.stack[-1] if self.stack else (0 if self.tags else -1)
+        self.tags.append(tag)
+        self.classes.append(attrs.get("class") or "")
+        self.parents.append(parent)
+        self.hrefs.append(attrs.get("href") if tag == "a" else None)
+        self.has_text.append(False)
+        self.hidden.append(tag in HIDDEN_TAGS or (parent >= 0 and self.hidden[parent]))
+        self.starts.append(len(self.pieces))
+        self.ends.append(None)
+        if tag in BLOCK_TAGS:
+            self.pieces.append(None)
+        if tag in VOID_TAGS:
+            self.ends[index] = len(self.pieces)
+        else:
+            self.stack.append(index)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in ("html", "body"):
+            return  # browsers keep both open until the document ends
+        # close any unclosed elements inside tag, like browsers do
+        for position in range(len(self.stack) - 1, -1, -1):
+            if self.tags[self.stack[position]] == tag:
+                for index in self.stack[position:]:
+                    if self.tags[index] in BLOCK_TAGS:
+                        self.pieces.append(None)
+                    self.ends[index] = len(self.pieces)
+                del self.stack[position:]
+                return
+
+    def handle_data(self, data):
+        if not self.stack:
+            return  # whitespace around the root
+        owner = self.stack[-1]
+        self.has_text[owner] = True
+        if not self.hidden[owner]:
+            self.pieces.append(data)
+
+    def get_records(self):
+        for index in self.stack:
+            self.ends[index] = len(self.pieces)
+        records = []
+        for index, tag in enumerate(self.tags):
+            inner_text = (
+                ""
+                if self.hidden[index]
+                else _inner_text(self.pieces[self.starts[index] : self.ends[index]])
+            )
+            records.append(
+                [
+                    tag,
+                    self.classes[index],
+                    self.parents[index],
+                    inner_text if self.has_text[index] else None,
+                    self.hrefs[index],
+                    inner_text,
+                ]
+            )
+        return records
+
+
+def _inner_text(pieces):
+    lines = [""]
+    for data in pieces:
+        if data is None:
+            lines.append("")
+        else:
+            lines[-1] += data
+    lines = [re.sub(r"\s+", " ", line).strip() for line in lines]
+    return "\n".join(line for line in lines if line)
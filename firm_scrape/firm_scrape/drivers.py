@@ -0,0 +1,148 @@
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from .api import discard_performance_log
+from .constants import DRIVER_MAX_MEMORY_MB, DRIVER_MAX_USES
+from .metrics import instrument_driver, span
+from .util import setup_webdriver
+
+
+class DriverPool:
+    """
+    Hands out warm Chrome instances. Drivers are reset between leases, and recycled (quit and replaced lazily) after max_uses leases or once their process tree grows past max_memory_mb.
+    """
+
+    def __init__(
+        self, size, max_uses=DRIVER_MAX_USES, max_memory_mb=DRIVER_MAX_MEMORY_MB
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self._idle = queue.LifoQueue()  # most recently used first, it is the warmest
+        self._slots = threading.BoundedSemaphore(size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def lease(self, blocking=True):
+        """
+        Context manager yielding a driver, which is always released on exit. Unless blocking, yields None at once instead of waiting when every driver is in use.
+        """
+        if not self._slots.acquire(blocking=blocking):
+            yield None
+            return
+        try:
+            driver = self._checkout()
+        except:
+            self._slots.release()
+            raise
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+            self._slots.release()
+
+    def _checkout(self):
+        if self._closed:
+            raise Exception("Driver pool is closed.")
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with span("driver_startup"):
+                driver = instrument_driver(setup_webdriver())
+            logging.info("Started a new pooled webdriver.")
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        return driver
+
+    def _release(self, driver):
+        if self._closed or self._should_recycle(driver):
+            self._discard(driver)
+            return
+        try:
+            reset_webdriver(driver)
+        except Exception as e:
+            logging.warning(f"Failed to reset webdriver, discarding it: {e}")
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def _should_recycle(self, driver):
+        if self._uses.get(id(driver), 0) >= self.max_uses:
+            logging.info("Recycling webdriver after reaching its use limit.")
+            return True
+        rss_mb = get_process_tree_rss(getattr(driver, "browser_pid", None)) / 2**20
+        if rss_mb > self.max_memory_mb:
+            logging.info(f"Recycling webdriver using {rss_mb:.0f} MB.")
+            return True
+        return False
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.error(e)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+@span("driver_reset")
+def reset_webdriver(driver):
+    """
+    Returns a driver to a blank state: a single tab, no cookies and no web storage.
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    try:
+        driver.execute_script(
+            "window.localStorage.clear(); window.sessionStorage.clear();"
+        )
+    except Exception:
+        pass  # opaque origins such as about:blank have no storage
+    driver.delete_all_cookies()
+    driver.get("about:blank")
+    discard_performance_log(driver)
+
+
+def get_process_tree_rss(pid):
+    """
+    Resident memory in bytes of pid and all of its descendants, read from /proc. Returns 0 where /proc is unavailable.
+    """
+    if pid is None or not os.path.isdir("/proc"):
+        return 0
+    children = {}
+    rss_pages = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces, so split after its closing paren
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        child = int(entry)
+        children.setdefault(int(fields[1]), []).append(child)
+        rss_pages[child] = int(fields[21])
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss_pages.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total * os.sysconf("SC_PAGE_SIZE")
@@ -0,0 +1,44 @@
+"""
+In-process publish/subscribe of job events, by topic. Running FirmJobs publish their progress on the "progress" topic of event_bus, and the web app republishes job state changes on the "jobs" topic, see progress.py.
+"""
+
+import queue
+import threading
+from collections import defaultdict
+
+
+class EventBus:
+    """
+    Every subscriber gets its own bounded queue; a subscriber that falls behind misses events rather than slowing down publishers.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic):
+        subscriber = queue.Queue(self.maxsize)
+        with self._lock:
+            self._subscribers[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, topic, subscriber):
+        with self._lock:
+            self._subscribers[topic].discard(subscriber)
+
+    def has_subscribers(self, topic):
+        with self._lock:
+            return bool(self._subscribers[topic])
+
+    def publish(self, topic, event):
+        with self._lock:
+            subscribers = list(self._subscribers[topic])
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass
+
+
+event_bus = EventBus()
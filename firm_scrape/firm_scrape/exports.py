@@ -0,0 +1,111 @@
+import csv
+import io
+import zlib
+
+import flask
+
+from .constants import EXPORT_CHUNK_SIZE
+from .database import connect
+
+
+def profiles_sql(where=""):
+    """
+    Selects profiles with their contact points joined back into the ";" separated emails, linkedins and others columns of the reports.
+    """
+    contacts = ",\n".join(
+        f"(select group_concat(value, ';') from contact_points"
+        f" where profile_id = profiles.id and kind = '{kind}') as {column}"
+        for kind, column in [
+            ("EMAIL", "emails"),
+            ("LINKEDIN", "linkedins"),
+            ("OTHER", "others"),
+        ]
+    )
+    return f"""
+        select profiles.id, location, firm_type, name, is_key,
+        {contacts},
+        is_invalid, job_id
+        from profiles {where}
+    """
+
+
+def iter_query_csv(queries, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields CSV text for each (sql, params) query in turn: a header row with the column names, then the rows, fetched chunk_size at a time. Only one chunk is held in memory at once.
+    """
+    con = connect()
+    outfile = io.StringIO("", newline="")
+    outcsv = csv.writer(outfile)
+    try:
+        for sql, params in queries:
+            cursor = con.execute(sql, params)
+            outcsv.writerow([column[0] for column in cursor.description])
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                outcsv.writerows(rows)
+                yield _drain(outfile)
+            yield _drain(outfile)
+    finally:
+        con.close()
+
+
+def iter_emails_csv(job_id, chunk_size=EXPORT_CHUNK_SIZE):
+    con = connect()
+    outfile = io.StringIO("", newline="")
+    outcsv = csv.writer(outfile)
+    outcsv.writerow(["email"])
+    empty = True
+    try:
+        cursor = con.execute(
+            """
+            select contact_points.value from profiles
+            join contact_points on contact_points.profile_id = profiles.id
+            where profiles.job_id = ? and contact_points.kind = 'EMAIL'
+            """,
+            (job_id,),
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            outcsv.writerows(rows)
+            empty = False
+            yield _drain(outfile)
+    finally:
+        con.close()
+    if empty:
+        outcsv.writerow(["No emails found!"])
+    yield _drain(outfile)
+
+
+def _drain(outfile):
+    text = outfile.getvalue()
+    outfile.seek(0)
+    outfile.truncate()
+    return text
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def csv_response(chunks, filename, gzip=False):
+    """
+    Streams chunks to the client as a CSV attachment, gzipped if requested.
+    """
+    if gzip:
+        resp = flask.Response(iter_gzip(chunks))
+        resp.headers["Content-Disposition"] = f'attachment; filename="{filename}.gz"'
+        resp.headers["Content-Type"] = "application/gzip"
+    else:
+        resp = flask.Response(chunks)
+        resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        resp.headers["Content-Type"] = "text/plain; charset=utf-8"
+    return resp
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from collections import defaultdict
+from html.parser import HTMLParser
+from urllib import parse
+
+import aiohttp
+
+try:
+    import lxml.html
+except ImportError:  # optional, html.parser is used instead
+    lxml = None
+
+from .constants import (
+    FETCH_HEADERS,
+    FETCH_MAX_CONNECTIONS,
+    FETCH_PER_HOST,
+    FETCH_TIMEOUT,
+)
+from .metrics import increment, span
+
+
+class _RateLimiter:
+    """
+    Spaces out the start of requests to one host to at most per_second a second.
+    """
+
+    def __init__(self, per_second):
+        self.interval = 1 / per_second if per_second else 0
+        self.next_start = 0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            delay = self.next_start - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_start = max(loop.time(), self.next_start) + self.interval
+
+
+async def _fetch(session, semaphores, rate_limiters, url, content_type):
+    host = parse.urlparse(url).netloc
+    async with semaphores[host]:
+        await rate_limiters[host].wait()
+        try:
+            async with session.get(url) as response:
+                increment("fetch_requests_total", status=response.status)
+                if response.status != 200:
+                    logging.info(f"Fetching {url} returned {response.status}.")
+                    return url, None
+                if content_type not in response.headers.get(
+                    "Content-Type", content_type
+                ):
+                    return url, None
+                increment("fetched_bytes_total", len(await response.read()))
+                return url, await response.text(errors="replace")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.info(f"Fetching {url} failed: {e!r}")
+            increment("fetch_errors_total")
+            return url, None
+
+
+async def _fetch_all(urls, per_host, per_second, content_type):
+    semaphores = defaultdict(lambda: asyncio.Semaphore(per_host))
+    rate_limiters = defaultdict(lambda: _RateLimiter(per_second))
+    connector = aiohttp.TCPConnector(limit=FETCH_MAX_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=timeout, headers=FETCH_HEADERS
+    ) as session:
+        return dict(
+            await asyncio.gather(
+                *[
+                    _fetch(session, semaphores, rate_limiters, url, content_type)
+                    for url in urls
+                ]
+            )
+        )
+
+
+@span("http_fetch")
+def fetch_pages(urls, per_host=FETCH_PER_HOST, per_second=None, content_type="html"):
+    """
+    Fetches urls concurrently over one pooled HTTP session, at most per_host at a time per host, and if per_second is given, starting at most that many requests per second per host. Returns {url: text}, with None for pages that failed or whose Content-Type does not contain content_type.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    return asyncio.run(_fetch_all(urls, per_host, per_second, content_type))
+
+
+class _AnchorParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href is not None:
+                self.hrefs.append(href)
+
+
+def extract_hrefs(html):
+    """
+    The href of every anchor in html, in document order.
+    """
+    if lxml is not None:
+        try:
+            return [str(href) for href in lxml.html.fromstring(html).xpath("//a/@href")]
+        except Exception as e:  # lxml rejects some documents html.parser accepts
+            logging.info(f"lxml failed to parse page, falling back: {e!r}")
+    parser = _AnchorParser()
+    parser.feed(html)
+    parser.close()
+    return parser.hrefs
@@ -0,0 +1,209 @@
+"""
+A durable job queue on top of the jobs table.
+
+A job is PENDING until a worker claims it, which moves it to RUNNING and gives the worker a lease. Workers renew the leases of their running jobs; if a worker dies, its leases expire and the jobs are claimed again, up to JOB_MAX_ATTEMPTS times.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_
+
+from firm_scrape.database import db_session
+from firm_scrape.models import (
+    BatchJob,
+    ContactPoint,
+    FirmJob,
+    JobStatus,
+    PersonalProfile,
+)
+from .constants import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+
+
+def _lease_expiry():
+    return datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def _claimable(now):
+    return or_(
+        FirmJob.status == JobStatus.PENDING,
+        and_(FirmJob.status == JobStatus.RUNNING, FirmJob.lease_expires < now),
+    )
+
+
+def submit_job(domain, firm_type, limit, batch_id, max_age):
+    """
+    Queues domain for scraping and returns its job. Domains that are already queued or running are left alone, and finished results are reused unless they failed or are older than max_age.
+    """
+    firm_job = FirmJob.query.filter_by(domain=domain).first()
+    if firm_job is None:
+        firm_job = FirmJob(domain, firm_type, limit)
+        db_session.add(firm_job)
+        try:
+            db_session.commit()
+            add_to_batch(firm_job, batch_id)
+            return firm_job
+        except:
+            # another submission inserted the same domain first
+            db_session.rollback()
+            firm_job = FirmJob.query.filter_by(domain=domain).one()
+
+    if firm_job.status == JobStatus.DONE and not firm_job.is_fresh(max_age):
+        logging.info(
+            f"Info in {domain}: Previous run failed or is stale, queueing a re-scrape."
+        )
+        firm_job.firm_type = firm_type
+        firm_job.limit = limit
+        firm_job.status = JobStatus.PENDING
+        firm_job.attempts = 0
+        firm_job.completed = False
+        firm_job.failed = False
+        firm_job.fail_reason = "N/A"
+        firm_job.end_time = None
+    db_session.commit()
+    add_to_batch(firm_job, batch_id)
+    return firm_job
+
+
+def add_to_batch(firm_job, batch_id):
+    if batch_id is None:
+        return
+    db_session.execute(
+        BatchJob.__table__.insert().prefix_with("OR IGNORE"),
+        {"batch_id": batch_id, "job_id": firm_job.id},
+    )
+    db_session.commit()
+
+
+def prepare_run(firm_job):
+    """
+    Discards the output of crashed attempts before firm_job executes. The last good result is kept until finish_job replaces it.
+    """
+    delete_profiles(firm_job, PersonalProfile.id > (firm_job.result_watermark or 0))
+    firm_job.count = 0
+    firm_job.team_url = None
+    db_session.commit()
+
+
+def delete_profiles(firm_job, condition):
+    profiles = db_session.query(PersonalProfile.id).filter(
+        PersonalProfile.job_id == firm_job.id, condition
+    )
+    ContactPoint.query.filter(ContactPoint.profile_id.in_(profiles)).delete(
+        synchronize_session=False
+    )
+    PersonalProfile.query.filter(
+        PersonalProfile.job_id == firm_job.id, condition
+    ).delete(synchronize_session=False)
+
+
+def abandon_exhausted_jobs():
+    """
+    Fails running jobs whose lease expired after their last allowed attempt.
+    """
+    abandoned = FirmJob.query.filter(
+        FirmJob.status == JobStatus.RUNNING,
+        FirmJob.lease_expires < datetime.now(),
+        FirmJob.attempts >= JOB_MAX_ATTEMPTS,
+    ).all()
+    for firm_job in abandoned:
+        firm_job.completed = True
+        firm_job.failed = True
+        firm_job.fail_reason = f"Abandoned after {JOB_MAX_ATTEMPTS} attempts."
+        finish_job(firm_job)
+    db_session.commit()
+    if abandoned:
+        logging.warning(f"Abandoned {len(abandoned)} jobs with expired leases.")
+
+
+def claim_job(worker_id):
+    """
+    Atomically moves the oldest claimable job to RUNNING under worker_id's lease. Returns its id, or None if the queue is empty.
+    """
+    abandon_exhausted_jobs()
+    while True:
+        now = datetime.now()
+        job_id = (
+            db_session.query(FirmJob.id)
+            .filter(_claimable(now))
+            .order_by(FirmJob.id)
+            .limit(1)
+            .scalar()
+        )
+        if job_id is None:
+            db_session.commit()
+            return None
+        # The WHERE clause repeats the claimable condition, so only one of
+        # several racing workers gets a row back.
+        claimed = (
+            db_session.query(FirmJob)
+            .filter(FirmJob.id == job_id, _claimable(now))
+            .update(
+                {
+                    FirmJob.status: JobStatus.RUNNING,
+                    FirmJob.lease_owner: worker_id,
+                    FirmJob.lease_expires: _lease_expiry(),
+                    FirmJob.attempts: func.coalesce(FirmJob.attempts, 0) + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db_session.commit()
+        if claimed:
+            return job_id
+
+
+def renew_leases(job_ids, worker_id):
+    if not job_ids:
+        return
+    db_session.query(FirmJob).filter(
+        FirmJob.id.in_(job_ids), FirmJob.lease_owner == worker_id
+    ).update({FirmJob.lease_expires: _lease_expiry()}, synchronize_session=False)
+    db_session.commit()
+
+
+def finish_job(firm_job):
+    """
+    Marks firm_job done. A run that found profiles without failing replaces the previous result. A failed or empty run is discarded, and the previous result kept, if there is one.
+    """
+    firm_job.status = JobStatus.DONE
+    firm_job.lease_owner = None
+    firm_job.lease_expires = None
+    firm_job.end_time = datetime.now()
+
+    db_session.flush()
+    kept = firm_job.result_watermark or 0
+    previous = PersonalProfile.query.filter(
+        PersonalProfile.job_id == firm_job.id, PersonalProfile.id <= kept
+    )
+    if (firm_job.count and not firm_job.failed) or previous.count() == 0:
+        delete_profiles(firm_job, PersonalProfile.id <= kept)
+        firm_job.result_watermark = (
+            db_session.query(func.max(PersonalProfile.id))
+            .filter(PersonalProfile.job_id == firm_job.id)
+            .scalar()
+        )
+    else:
+        logging.info(
+            f"Info in {firm_job.domain}: Run found nothing, keeping the previous result."
+        )
+        delete_profiles(firm_job, PersonalProfile.id > kept)
+        firm_job.count = previous.count()
+
+
+def release_job(job_id, reason):
+    """
+    Returns a job whose run crashed to the queue, or fails it if it has no attempts left.
+    """
+    firm_job = FirmJob.query.filter_by(id=job_id).one()
+    if (firm_job.attempts or 0) < JOB_MAX_ATTEMPTS:
+        logging.warning(f"Retrying {firm_job.domain} later: {reason}")
+        firm_job.status = JobStatus.PENDING
+        firm_job.lease_owner = None
+        firm_job.lease_expires = None
+    else:
+        firm_job.completed = True
+        firm_job.failed = True
+        firm_job.fail_reason = reason[:500]
+        finish_job(firm_job)
+    db_session.commit()
@@ -0,0 +1,124 @@
+"""
+Server-side paging of the jobs table for the /jobs views.
+
+Pages are keyset paginated: instead of an offset, the client passes the id of the last job it was shown, and the next page starts right after that job in the chosen sort order. Every page costs the same however deep it is.
+"""
+
+from sqlalchemy import and_, func, or_
+
+from firm_scrape.database import db_session
+from firm_scrape.models import (
+    BatchJob,
+    ContactKind,
+    ContactPoint,
+    FirmJob,
+    FirmType,
+    JobStatus,
+    PersonalProfile,
+)
+from .constants import JOBS_PAGE_SIZE
+
+SORT_COLUMNS = {
+    "id": FirmJob.id,
+    "domain": FirmJob.domain,
+}
+
+
+def parse_job_filters(args):
+    """
+    The filters, sort and cursor of a /jobs request, ignoring unknown values.
+    """
+    return {
+        "batch": args.get("batch") or None,
+        "status": (
+            args.get("status") if args.get("status") in JobStatus.__members__ else None
+        ),
+        "firm_type": (
+            args.get("firm_type")
+            if args.get("firm_type") in FirmType.__members__
+            else None
+        ),
+        "sort": args.get("sort") if args.get("sort") in SORT_COLUMNS else "id",
+        "order": "asc" if args.get("order") == "asc" else "desc",
+        "after": int(args["after"]) if args.get("after", "").isdigit() else None,
+    }
+
+
+def list_jobs(
+    batch=None,
+    status=None,
+    firm_type=None,
+    sort="id",
+    order="desc",
+    after=None,
+    limit=JOBS_PAGE_SIZE,
+):
+    """
+    One page of jobs, and the cursor of the next page (None on the last page). Ties in the sort column are broken by id, so the order is total and the cursor unambiguous.
+    """
+    column = SORT_COLUMNS[sort]
+    query = FirmJob.query
+    if batch:
+        query = query.filter(
+            FirmJob.id.in_(
+                db_session.query(BatchJob.job_id).filter(BatchJob.batch_id == batch)
+            )
+        )
+    if status:
+        query = query.filter(FirmJob.status == JobStatus[status])
+    if firm_type:
+        query = query.filter(FirmJob.firm_type == FirmType[firm_type])
+
+    if after is not None:
+        last = db_session.query(column).filter(FirmJob.id == after).scalar()
+        if order == "asc":
+            query = query.filter(
+                or_(column > last, and_(column == last, FirmJob.id > after))
+            )
+        else:
+            query = query.filter(
+                or_(column < last, and_(column == last, FirmJob.id < after))
+            )
+
+    if order == "asc":
+        query = query.order_by(column.asc(), FirmJob.id.asc())
+    else:
+        query = query.order_by(column.desc(), FirmJob.id.desc())
+
+    # one extra row tells whether there is a next page
+    jobs = query.limit(limit + 1).all()
+    next_after = jobs[limit - 1].id if len(jobs) > limit else None
+    return jobs[:limit], next_after
+
+
+def count_results(job_ids):
+    """
+    {job id: {"profiles": n, "emails": n}} for the given jobs, counted in one grouped query.
+    """
+    counts = {job_id: {"profiles": 0, "emails": 0} for job_id in job_ids}
+    if not job_ids:
+        return counts
+    rows = (
+        db_session.query(
+            PersonalProfile.job_id,
+            func.count(func.distinct(PersonalProfile.id)),
+            func.count(ContactPoint.id),
+        )
+        .outerjoin(
+            ContactPoint,
+            and_(
+                ContactPoint.profile_id == PersonalProfile.id,
+                ContactPoint.kind == ContactKind.EMAIL,
+            ),
+        )
+        .filter(PersonalProfile.job_id.in_(job_ids))
+        .group_by(PersonalProfile.job_id)
+    )
+    for job_id, profiles, emails in rows:
+        counts[job_id] = {"profiles": profiles, "emails": emails}
+    return counts
+
+
+def jobs_to_dicts(jobs):
+    counts = count_results([job.id for job in jobs])
+    return [dict(job.to_dict(), **counts[job.id]) for job in jobs]
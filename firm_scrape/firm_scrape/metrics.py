@@ -0,0 +1,188 @@
+"""
+Timing spans and counters for the scrape pipeline.
+
+Phases of a job are timed with span(), used as a context manager or a decorator, and events like WebDriver round trips and fetched bytes are counted with increment(). Everything is recorded twice: in the process-wide metrics registry, exported in the Prometheus text format by /metrics and by each worker's metrics server, and in the registry of the job running on the current thread, if any, which the scheduler stores as the job's timing summary.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .wait import wait_timings
+
+PREFIX = "firm_scrape"
+
+
+class Metrics:
+    """
+    Thread safe registry of span timings per phase and labelled counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = defaultdict(float)
+
+    def record_span(self, phase, seconds):
+        with self._lock:
+            stats = self._spans.setdefault(
+                phase, {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+
+    def increment(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def summary(self):
+        """
+        The spans by phase and the counters summed over their labels, as stored in jobs.timings.
+        """
+        with self._lock:
+            counters = defaultdict(float)
+            for (name, _), value in self._counters.items():
+                counters[name] += value
+            return {
+                "spans": {phase: dict(stats) for phase, stats in self._spans.items()},
+                "counters": dict(counters),
+            }
+
+    def render(self):
+        """
+        The registry in the Prometheus text exposition format.
+        """
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+        lines = [f"# TYPE {PREFIX}_phase_seconds summary"]
+        for phase, stats in spans:
+            lines.append(
+                f'{PREFIX}_phase_seconds_count{{phase="{phase}"}} {stats["count"]}'
+            )
+            lines.append(
+                f'{PREFIX}_phase_seconds_sum{{phase="{phase}"}} {stats["total"]}'
+            )
+        lines.append(f"# TYPE {PREFIX}_phase_seconds_max gauge")
+        for phase, stats in spans:
+            lines.append(
+                f'{PREFIX}_phase_seconds_max{{phase="{phase}"}} {stats["max"]}'
+            )
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}_{name} counter")
+                typed.add(name)
+            lines.append(f"{PREFIX}_{name}{_labels(labels)} {value}")
+        waits = sorted(wait_timings.summary().items())
+        lines.append(f"# TYPE {PREFIX}_wait_seconds summary")
+        for kind, stats in waits:
+            lines.append(
+                f'{PREFIX}_wait_seconds_count{{kind="{kind}"}} {stats["count"]}'
+            )
+            lines.append(f'{PREFIX}_wait_seconds_sum{{kind="{kind}"}} {stats["total"]}')
+        lines.append(f"# TYPE {PREFIX}_wait_timeouts_total counter")
+        for kind, stats in waits:
+            lines.append(
+                f'{PREFIX}_wait_timeouts_total{{kind="{kind}"}} {stats["timeouts"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    # label values are command names and the like, nothing that needs escaping
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{{{pairs}}}"
+
+
+metrics = Metrics()
+_current = threading.local()
+
+
+@contextmanager
+def job_metrics(registry=None):
+    """
+    Context manager yielding a registry that collects the spans and counters of the current thread until exit: a fresh one, or registry, to count a job's helper threads with the job.
+    """
+    previous = getattr(_current, "job", None)
+    _current.job = registry if registry is not None else Metrics()
+    try:
+        yield _current.job
+    finally:
+        _current.job = previous
+
+
+def current_job_metrics():
+    return getattr(_current, "job", None)
+
+
+@contextmanager
+def span(phase):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        seconds = time.monotonic() - start
+        metrics.record_span(phase, seconds)
+        job = getattr(_current, "job", None)
+        if job is not None:
+            job.record_span(phase, seconds)
+
+
+def increment(name, value=1, **labels):
+    metrics.increment(name, value, **labels)
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.increment(name, value, **labels)
+
+
+def instrument_driver(driver):
+    """
+    Counts and times every WebDriver round trip made through driver, including those of its elements.
+    """
+    execute = driver.execute
+
+    def counted_execute(driver_command, params=None):
+        start = time.monotonic()
+        try:
+            return execute(driver_command, params)
+        finally:
+            increment("webdriver_commands_total", command=driver_command)
+            increment(
+                "webdriver_seconds_total",
+                time.monotonic() - start,
+                command=driver_command,
+            )
+
+    driver.execute = counted_execute
+    return driver
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scraped every few seconds, not worth a log line
+
+
+def serve_metrics(port):
+    """
+    Serves this process's /metrics on port in a background thread, for processes without the web app (workers).
+    """
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,6 +1,6 @@
 from datetime import datetime
 import enum
-from firm_scrape.util import setup_webdriver
+import json
 from sqlalchemy import (
     Column,
     Integer,
@@ -9,12 +9,17 @@ from sqlalchemy import (
     Enum,
     ARRAY,
     DateTime,
-    text,
     ForeignKey,
+    UniqueConstraint,
 )
 from firm_scrape.database import Base
-from sqlalchemy.orm import mapped_column, relationship
+from sqlalchemy.orm import mapped_column, reconstructor, relationship
 from .constants import (
+    FETCH_PER_HOST,
+    SEARCH_CONFIG_DRIVERS,
+    SEARCH_CONFIG_PATIENCE,
+    SITEMAP_BATCH_SIZE,
+    SITEMAP_REQUESTS_PER_SECOND,
     LAW_FIRM_KEY_PRACTICES,
     LAW_FIRM_KEY_TITLES,
     INVESTMENT_BANK_KEY_TITLES,
@@ -24,13 +29,53 @@ from .constants import (
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support.ui import Select
-from .util import setup_webdriver, get_profile_selector
-import time
+from .api import (
+    api_page_url,
+    capture_json_responses,
+    discard_performance_log,
+    find_listing_api,
+    iter_listing_api,
+    named_count,
+)
+from .cache import (
+    get_recipe,
+    get_sitemap_page_urls,
+    get_validators,
+    put_recipe,
+    recipe_cache,
+    team_url_cache,
+)
+from .drivers import reset_webdriver
+from .events import event_bus
+from .metrics import current_job_metrics, job_metrics, span
+from .fetch import extract_hrefs, fetch_pages
+from .static import (
+    anchor_hrefs,
+    fetch_snapshot,
+    find_next_page_href,
+    harvest_static_previews,
+    iter_prefetched_pages,
+)
+from .util import (
+    click_link,
+    count_matches,
+    count_names,
+    derive_profile_selector,
+    find_next_link,
+    get_profile_selector,
+    harvest_previews,
+)
+from .wait import settle
+import hashlib
+import itertools
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from urllib import parse
 from firm_scrape.database import db_session
 import requests
-from usp.tree import sitemap_tree_for_homepage
 from selenium.webdriver.common.keys import Keys
 
 
@@ -39,6 +84,18 @@ class FirmType(enum.Enum):
     INVESTMENT = 2
 
 
+class JobStatus(enum.Enum):
+    PENDING = 1
+    RUNNING = 2
+    DONE = 3
+
+
+class ContactKind(enum.Enum):
+    EMAIL = 1
+    LINKEDIN = 2
+    OTHER = 3
+
+
 class FirmJob(Base):
     __tablename__ = "jobs"
     id = Column(Integer, primary_key=True)
@@ -46,7 +103,7 @@ class FirmJob(Base):
     domain = Column(String(100), unique=True)
     firm_type = Column(Enum(FirmType))
 
-    completed = Column(Boolean)
+    completed = Column(Boolean, index=True)
     failed = Column(Boolean)
     fail_reason = Column(String(500))
 
@@ -55,9 +112,26 @@ class FirmJob(Base):
 
     count = Column(Integer)
     limit = Column(Integer)
+    # profiles of this job with ids up to this one are its last good result,
+    # kept until a later run replaces them (see jobqueue.finish_job)
+    result_watermark = Column(Integer)
 
     team_url = Column(String(100))
 
+    # queue state, see jobqueue.py
+    status = Column(Enum(JobStatus), index=True)
+    attempts = Column(Integer)
+    lease_owner = Column(String(100))
+    lease_expires = Column(DateTime)
+
+    # live progress of a running job as JSON, see progress.py
+    progress = Column(String(1000))
+    # time spent per phase of the last run as JSON, see metrics.py
+    timings = Column(String)
+    updated_at = Column(
+        DateTime, default=datetime.now, onupdate=datetime.now, index=True
+    )
+
     profiles = relationship("PersonalProfile", back_populates="job")
 
     def __init__(self, domain, firm_type, limit):
@@ -68,15 +142,99 @@ class FirmJob(Base):
         self.completed = False
         self.failed = False
         self.fail_reason = "N/A"
+        self.status = JobStatus.PENDING
+        self.attempts = 0
+        self.init_on_load()
+
+    @reconstructor
+    def init_on_load(self):
+        # the recipe being replayed, and the one this run learns (see get_recipe)
+        self.recipe = {}
+        self.learned = {}
 
     def __repr__(self):
         return self.domain
 
-    def execute(self, name_set):
+    def is_fresh(self, max_age):
+        """
+        Whether this job finished successfully within max_age, so its results can be reused instead of scraping again.
+        """
+        if self.status != JobStatus.DONE or self.failed:
+            return False
+        finished = self.end_time or self.start_time
+        return finished is not None and datetime.now() - finished < max_age
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "domain": self.domain,
+            "firm_type": self.firm_type.name,
+            "status": self.status.name if self.status else None,
+            "attempts": self.attempts,
+            "count": self.count,
+            "completed": self.completed,
+            "failed": self.failed,
+            "fail_reason": self.fail_reason,
+            "start_time": self.start_time.isoformat() if self.start_time else None,
+            "progress": json.loads(self.progress) if self.progress else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def report(self, **progress):
+        """
+        Publishes a progress event for this job, see progress.py.
+        """
+        event_bus.publish("progress", dict(progress, id=self.id))
+
+    def execute(self, name_set, driver_pool):
+        """
+        Scrapes the firm over plain HTTP first. A Chrome is only leased from driver_pool, for the browser strategies, if that finds no profiles. If an earlier run left a recipe for the domain, its strategy is replayed directly, skipping what it already discovered; each run that finds profiles saves the recipe it learned for the next.
+        """
+        self.recipe = get_recipe(self.domain)
+        self.learned = {}
+        strategy = self.recipe.get("strategy")
+        if strategy is not None:
+            logging.info(f"Info in {self.domain}: Replaying {strategy} recipe.")
+
+        if strategy == "api":
+            try:
+                self.replay_listing_api(name_set)
+            except Exception as e:
+                logging.info(f"Info in {self.domain}: Recipe's listing API failed: {e}")
+        if self.count == 0 and strategy in (None, "static"):
+            try:
+                self.execute_static_strategy(name_set)
+            except Exception as e:
+                logging.info(f"Info in {self.domain}: Static strategy failed: {e}")
+        if self.count == 0:
+            logging.info(f"Info in {self.domain}: Escalating to the browser.")
+            with driver_pool.lease() as driver:
+                self.execute_in_browser(name_set, driver, driver_pool)
+        self.completed = True
+
+        if self.count > 0 and not self.failed:
+            recipe = dict(self.learned)
+            if recipe.get("strategy") in ("api", "static", "team"):
+                recipe["team_url"] = self.team_url  # the sitemap strategy has none
+            put_recipe(self.domain, recipe)
+        elif self.recipe:
+            recipe_cache.invalidate(self.domain)
+
+    @span("browser")
+    def execute_in_browser(self, name_set, driver, driver_pool=None):
+        if self.recipe.get("strategy") == "sitemap":
+            try:
+                self.execute_sitemap_strategy(driver)
+                if self.count > 0:
+                    return
+            except Exception as e:
+                logging.info(f"Info in {self.domain}: Recipe's sitemap failed: {e}")
+            reset_webdriver(driver)
+
         team_fail_reason = ""
         # TODO maybe fail reason for both strategies
         try:
-            self.execute_team_page_strategy(name_set)
+            self.execute_team_page_strategy(name_set, driver, driver_pool)
         except Exception as e:
             logging.warning(
                 "Team page strategy failed for {self.domain}, switching to sitemap strategy."
@@ -84,96 +242,274 @@ class FirmJob(Base):
             team_fail_reason = str(e)
             logging.error(e)
             try:
-                self.execute_sitemap_strategy()
+                reset_webdriver(driver)
+                self.execute_sitemap_strategy(driver)
             except Exception as e:
                 logging.error(e)
                 self.failed = True
                 self.fail_reason = team_fail_reason
-        self.completed = True
 
-    def execute_sitemap_strategy(self):
+    def get_team_page_keywords(self):
+        # Build a new list: extending TEAM_PAGE_KEYWORDS in place would leak between jobs.
+        if self.firm_type == FirmType.LAW:
+            return TEAM_PAGE_KEYWORDS + LAW_FIRM_TEAM_PAGE_KEYWORDS
+        return TEAM_PAGE_KEYWORDS
+
+    def execute_sitemap_strategy(self, driver):
+        """
+        Finds profile pages by keyword in the sitemap and fetches them concurrently over HTTP, a batch at a time, until the job's limit is reached. Pages the static fetch gets nothing from are loaded in the browser instead.
+        """
         self.start_time = datetime.now()
-        driver = setup_webdriver()
         url = f"http://{self.domain}"
-        driver.get(url)
-        time.sleep(5)
 
-        tree = sitemap_tree_for_homepage(url)
+        self.learned["strategy"] = "sitemap"
+        self.report(strategy="sitemap", page=0, profiles=self.count)
+        with span("sitemap_discovery"):
+            page_urls = get_sitemap_page_urls(self.domain, url)
+        profile_hrefs = self.iter_sitemap_profile_hrefs(page_urls)
+
+        found = 0
+        batch_index = 0
+        while self.count < self.limit:
+            batch_size = min(SITEMAP_BATCH_SIZE, self.limit - self.count)
+            batch = list(itertools.islice(profile_hrefs, int(batch_size)))
+            if not batch:
+                break
+            pages = fetch_pages(
+                batch, per_host=FETCH_PER_HOST, per_second=SITEMAP_REQUESTS_PER_SECOND
+            )
 
-        profile_hrefs = []
+            profiles = []
+            for profile_href in batch:
+                profile = PersonalProfile(profile_href, self.firm_type, self.id)
+                page = pages.get(profile_href)
+                hrefs = extract_hrefs(page) if page else []
+                if hrefs:
+                    profile.update_with_hrefs(hrefs)
+                else:
+                    with span("bio_visits"):
+                        driver.get(profile_href)
+                        settle(driver, "profile")
+                        root = driver.find_element(By.XPATH, "/*")
+                        profile.update_with_full_element(root)
+                profiles.append(profile)
+            self.count += len(profiles)
+            found += len(profiles)
+            self.save_profiles(profiles)
+            batch_index += 1
+            self.report(page=batch_index, profiles=self.count)
+        logging.info(f"Info in {self.domain}: Found {found} sitemap profiles.")
+        logging.info(f"Info in {self.domain}: Finished!")
 
-        for page in tree.all_pages():
-            url = page.url
+    def iter_sitemap_profile_hrefs(self, page_urls):
+        """
+        Lazily yields each distinct sitemap page whose path contains a team page keyword.
+        """
+        team_page_keywords = self.get_team_page_keywords()
+        seen = set()
+        for page_url in page_urls:
+            url, _ = parse.urldefrag(page_url)
+            if url in seen:
+                continue
             parsed = parse.urlparse(url)
-
-            team_page_keywords = TEAM_PAGE_KEYWORDS
-            if self.firm_type == FirmType.LAW:
-                team_page_keywords += LAW_FIRM_TEAM_PAGE_KEYWORDS
-
             for keyword in team_page_keywords:
                 if keyword in parsed.path:
-                    profile_hrefs += url
+                    seen.add(url)
+                    yield url
                     break
-        logging.info(f"Url inspection found {len(profile_hrefs)} profile hrefs.")
-
-        profiles = []
-        for profile_href in profile_hrefs:
-            driver.get(profile_href)
-            time.sleep(5)
 
-            profile = PersonalProfile(profile_href, self.firm_type, self.id)
-            profiles += profile
-
-            root = driver.find_element(By.XPATH, "/*")
-            profile.update_with_full_element(root)
-
-        for profile in profiles:
-            db_session.add(profile)
-            try:
-                db_session.commit()
-            except:
-                db_session.rollback()
-        logging.info(f"Info in {self.domain}: Finished!")
-
-    def execute_team_page_strategy(self, name_set):
+    def execute_team_page_strategy(self, name_set, driver, driver_pool=None):
         self.start_time = datetime.now()
-        driver = setup_webdriver()
+        self.learned["strategy"] = "team"
+        self.report(strategy="team", page=0, profiles=self.count)
 
         url = f"http://{self.domain}"
 
-        driver.get(url)
-
-        time.sleep(5)
+        recalled_url = self.recipe.get("team_url") or team_url_cache.get(self.domain)
+        recalled_error = None
+        if recalled_url is not None:
+            logging.info(
+                f"Info in {self.domain}: Using cached team page {recalled_url}"
+            )
+            self.team_url = recalled_url
+            try:
+                return self.process_team_page(driver, name_set, driver_pool)
+            except Exception as e:
+                if self.count > 0:
+                    raise
+                recalled_error = e
+
+        with span("homepage_load"):
+            driver.get(url)
+            settle(driver, "homepage")
+
+        team_url = self.find_team_url(driver, url)
+        if recalled_error is not None:
+            if team_url == recalled_url:
+                raise recalled_error  # it has not moved, it failed as it is
+            self.forget_team_url(recalled_error)
+        if team_url is None:
+            raise Exception("Failed to find a team page. Is the page still up?")
+        logging.info(f"Info in {self.domain}: Found team page for {url}: {team_url}")
+        self.team_url = team_url
+        team_url_cache.put(self.domain, team_url, get_validators([url]))
+        return self.process_team_page(driver, name_set, driver_pool)
+
+    def forget_team_url(self, error):
+        """
+        Drops the recalled team page from the recipe and the cache, after it failed with error and the homepage no longer links to it.
+        """
+        logging.info(
+            f"Info in {self.domain}: Cached team page failed and has moved: {error}"
+        )
+        team_url_cache.invalidate(self.domain)
+        self.recipe.pop("team_url", None)
 
+    @span("team_page_discovery")
+    def find_team_url(self, driver, url):
+        """
+        The first link on the loaded homepage whose path contains a team page keyword, or None.
+        """
         anchors = driver.find_elements(By.TAG_NAME, "a")
         if len(anchors) == 0:
             logging.error(f"Error in {self.domain}: had no anchors.")
 
-        for anchor in anchors:
-            href = anchor.get_dom_attribute("href")
+        return self.match_team_href(
+            url, (anchor.get_dom_attribute("href") for anchor in anchors)
+        )
+
+    def match_team_href(self, url, hrefs):
+        """
+        The first of hrefs whose path contains a team page keyword, resolved against url, or None.
+        """
+        team_page_keywords = self.get_team_page_keywords()
+        for href in hrefs:
             if href is not None:
                 parsed = parse.urlparse(href)
-
-                team_page_keywords = TEAM_PAGE_KEYWORDS
-                if self.firm_type == FirmType.LAW:
-                    team_page_keywords += LAW_FIRM_TEAM_PAGE_KEYWORDS
-
                 for keyword in team_page_keywords:
                     if keyword in parsed.path:
-                        team_url = parse.urljoin(url, href)
-                        logging.info(
-                            f"Info in {self.domain}: Found team page for {url}: {team_url}"
-                        )
-                        self.team_url = team_url
-                        return self.process_team_page(driver, name_set)
-        raise Exception("Failed to find a team page. Is the page still up?")
+                        return parse.urljoin(url, href)
+        return None
+
+    @span("static")
+    def execute_static_strategy(self, name_set):
+        """
+        The team page strategy without a browser: the homepage, team page and its pagination are fetched over HTTP, and names, the profile selector and previews are all found in DomSnapshots of the static HTML. Search filters are not applied, so this finds profiles only where the unfiltered directory is server rendered.
+        """
+        self.start_time = datetime.now()
+        self.learned["strategy"] = "static"
+        self.report(strategy="static", page=0, profiles=self.count)
+        url = f"http://{self.domain}"
 
-    def process_team_page(self, driver, name_set):
+        recalled_url = self.recipe.get("team_url") or team_url_cache.get(self.domain)
+        recalled_error = None
+        if recalled_url is not None:
+            try:
+                return self.scrape_static_team_page(name_set, recalled_url)
+            except Exception as e:
+                if self.count > 0:
+                    raise
+                recalled_error = e
+
+        homepage = fetch_snapshot(url)
+        if homepage is None:
+            raise Exception("Failed to fetch the homepage.")
+        team_url = self.match_team_href(url, anchor_hrefs(homepage))
+        if recalled_error is not None:
+            if team_url == recalled_url:
+                raise recalled_error  # it has not moved, it failed as it is
+            self.forget_team_url(recalled_error)
+        if team_url is None:
+            raise Exception("Failed to find a team page in the static homepage.")
+        logging.info(f"Info in {self.domain}: Found team page for {url}: {team_url}")
+        team_url_cache.put(self.domain, team_url, get_validators([url]))
+        self.scrape_static_team_page(name_set, team_url)
+
+    def scrape_static_team_page(self, name_set, team_url):
         """
-        Processes the team page - finds relevant search functionality, and uses it. Then, delegates to scrape_team_page to do the actual scraping.
+        Scrapes the server rendered directory at team_url and the following pages of it, for execute_static_strategy.
         """
-        driver.get(self.team_url)
-        time.sleep(5)
+        self.team_url = team_url
+        page_url = team_url
+        snapshot = fetch_snapshot(page_url)
+        if snapshot is None:
+            raise Exception("Failed to fetch the team page.")
+        profile_class = self.recipe.get("profile_selector")
+        if (
+            profile_class is None
+            or len(harvest_static_previews(snapshot, profile_class)) < 2
+        ):
+            with span("profile_selector"):
+                profile_class = derive_profile_selector(snapshot, name_set)
+        self.learned["profile_selector"] = profile_class
+        logging.info(f"Found profile class {profile_class}")
+
+        page_index = 1
+        visited = {page_url}
+        found = 0
+        seen_profiles = set()
+        prefetch = True  # given up on once it fails, as in scrape_team_page
+        while True:
+            previews = harvest_static_previews(snapshot, profile_class)
+            new_profiles = self.profiles_from_previews(
+                name_set, previews, page_url, seen_profiles
+            )
+            self.enrich_profiles(
+                None,
+                [
+                    new_profile
+                    for new_profile in new_profiles
+                    if not new_profile.contains_email()
+                ],
+            )
+            self.save_profiles(new_profiles)
+            found += len(new_profiles)
+            self.report(page=page_index, profiles=self.count)
+
+            if self.count >= self.limit:
+                break
+            next_href = find_next_page_href(snapshot, page_index)
+            if next_href is None:
+                break
+            next_url = parse.urljoin(page_url, next_href)
+            if next_url in visited:
+                break
+            if prefetch:
+                prefetched = self.scrape_prefetched_pages(
+                    None,
+                    name_set,
+                    profile_class,
+                    next_url,
+                    page_index + 1,
+                    len(new_profiles),
+                    seen_profiles,
+                )
+                if prefetched is not None:
+                    found += prefetched
+                    break
+                prefetch = False
+            snapshot = fetch_snapshot(next_url)
+            if snapshot is None:
+                break
+            page_url = next_url
+            visited.add(page_url)
+            page_index += 1
+
+        logging.info(
+            f"Info in {self.domain}: Found {found} profiles without the browser."
+        )
+
+    def process_team_page(self, driver, name_set, driver_pool=None):
+        """
+        Processes the team page - finds relevant search functionality, and uses it. Then, delegates to scrape_team_page, or explore_search_configs for select filters, to do the actual scraping.
+        """
+        discard_performance_log(driver)
+        with span("team_page_load"):
+            driver.get(self.team_url)
+            settle(driver, "team_page")
+
+        if self.execute_listing_api_strategy(driver, name_set):
+            return
 
         # apply search
         # For each search query, populate every page, if it exists
@@ -183,7 +519,7 @@ class FirmJob(Base):
 
         key_selects = []
 
-        for select_tag in select_tags:
+        for select_index, select_tag in enumerate(select_tags):
             key_options_text = []
             select = Select(select_tag)
             for option in select.options:
@@ -197,7 +533,8 @@ class FirmJob(Base):
                 ):
                     key_options_text.append(option.text)
             if key_options_text:
-                key_selects.append((select, key_options_text))
+                # by index, so the configs can be applied on other drivers
+                key_selects.append((select_index, key_options_text))
 
         # now, unfold key_selects
 
@@ -209,12 +546,27 @@ class FirmJob(Base):
             if idx == len(key_selects):
                 configs.append(config)
                 return
-            select, key_options_text = key_selects[idx]
+            select_index, key_options_text = key_selects[idx]
             for key_option_text in key_options_text:
-                new_config = config + [(select, key_option_text)]
+                new_config = config + [(select_index, key_option_text)]
                 add_configs(idx + 1, configs, new_config)
 
         add_configs(0, search_configs, [])
+        # the configurations that found profiles last time go first, and the
+        # rest still follow, in case the directory grew
+        recalled_configs = [
+            [tuple(step) for step in search_config]
+            for search_config in self.recipe.get("search_configs", [])
+        ]
+        search_configs = [
+            search_config
+            for search_config in recalled_configs
+            if search_config in search_configs
+        ] + [
+            search_config
+            for search_config in search_configs
+            if search_config not in recalled_configs
+        ]
         logging.info(search_configs)
 
         config_count = len(search_configs)
@@ -222,34 +574,8 @@ class FirmJob(Base):
         # TODO search only with law firms, not worth otherwise
 
         if not (config_count == 1 and search_configs[0] == []):
-
-            failed_config_count = 0
-
-            for (
-                search_config
-            ) in (
-                search_configs
-            ):  # TODO Non-select (div, etc) filtering
-                for select, option_text in search_config:
-                    print(select)
-                    logging.info("executing select")
-                    select.select_by_visible_text(option_text)
-                    time.sleep(0.5)
-                logging.info("executing search")
-                search_button = self.find_search_button(driver)
-                driver.execute_script("arguments[0].click();", search_button)
-                time.sleep(5)
-                logging.info("executing scrape")
-                try:
-                    self.scrape_team_page(driver, name_set)
-                except:
-                    logging.info("No results for filter.")
-                    failed_config_count += 1
-
-            if failed_config_count == config_count:
-                raise Exception(
-                    "No filtering configuration was effective."
-                )  # TODO do we always want to raise exception?
+            # TODO Non-select (div, etc) filtering
+            self.explore_search_configs(driver, driver_pool, name_set, search_configs)
         elif self.firm_type == FirmType.LAW:
             # attempt to use the input box
             logging.info("No select elements found, trying search_box strategy")
@@ -264,15 +590,19 @@ class FirmJob(Base):
                 ):  # HACK This is the best filter, generally, for what we want.
 
                     logging.info("Sending keys.")
+                    discard_performance_log(driver)
                     search_box.send_keys(key_practice)
                     search_box.send_keys(Keys.RETURN)
 
                     # search_button = self.find_search_button(driver)
                     # driver.execute_script("arguments[0].click();", search_button)
-                    time.sleep(5)
+                    settle(driver, "search")
                     logging.info("executing scrape")
                     try:
-                        self.scrape_team_page(driver, name_set)
+                        if not self.execute_listing_api_strategy(
+                            driver, name_set, learn=False
+                        ):
+                            self.scrape_team_page(driver, name_set)
                         search_box = self.find_search_box(driver)
                     except:
                         logging.info(
@@ -284,6 +614,305 @@ class FirmJob(Base):
         else:
             self.scrape_team_page(driver, name_set)
 
+    @span("listing_api")
+    def execute_listing_api_strategy(self, driver, name_set, learn=True):
+        """
+        Scrapes the directory through the JSON API the loaded page just got its listing from, if it did (see find_page_listing_api and scrape_listing_api). Returns whether an API was found.
+        """
+        listing_api = self.find_page_listing_api(driver, name_set, self.domain)
+        if listing_api is None:
+            return False
+        url, path, records = listing_api
+        logging.info(f"Info in {self.domain}: Found listing API {url}")
+        self.scrape_listing_api(driver, name_set, url, path, records, learn)
+        return True
+
+    def find_page_listing_api(self, driver, name_set, domain):
+        """
+        The listing API (see find_listing_api) among the responses since the performance log was last read, or None. One that is not paged must name at least as many people as the loaded page shows, since it may feed a widget rather than the listing. Takes the job's domain rather than reading it, so it can run on any thread.
+        """
+        listing_api = find_listing_api(capture_json_responses(driver), name_set)
+        if listing_api is None:
+            return None
+        url, path, records = listing_api
+        if api_page_url(url, 1, len(records)) is None and named_count(
+            records, name_set
+        ) < count_names(driver, name_set):
+            logging.info(
+                f"Info in {domain}: Listing API {url} names fewer people than the page, ignoring it."
+            )
+            return None
+        return listing_api
+
+    @span("listing_api")
+    def replay_listing_api(self, name_set):
+        """
+        Scrapes the directory through the listing API of the recipe, without a browser, once its first page still holds the listing where the recipe says.
+        """
+        url = self.recipe["api_url"]
+        path = self.recipe["api_path"]
+        self.team_url = self.recipe["team_url"]
+        body = fetch_pages([url], content_type="json").get(url)
+        if body is None:
+            raise Exception("Failed to fetch the listing API.")
+        listing_api = find_listing_api([(url, json.loads(body))], name_set)
+        if listing_api is None or listing_api[1] != path:
+            raise Exception("The listing API no longer has the listing.")
+        self.start_time = datetime.now()
+        self.scrape_listing_api(None, name_set, url, path, listing_api[2])
+
+    def scrape_listing_api(self, driver, name_set, url, path, records, learn=True):
+        """
+        Saves records, the first page of the listing API at url, and the following pages (see iter_listing_api), up to the job's limit. The API is learned for the recipe unless learn is False, as for the results of a search.
+        """
+        if learn:
+            self.learned.update(strategy="api", api_url=url, api_path=path)
+        self.report(strategy="api", page=0, profiles=self.count)
+
+        found = 0
+        pages = iter_listing_api(url, path, records, self.team_url)
+        for page_index, (_, previews) in enumerate(pages, 1):
+            new_profiles = self.profiles_from_previews(
+                name_set, previews, self.team_url
+            )
+            self.enrich_profiles(
+                driver,
+                [
+                    new_profile
+                    for new_profile in new_profiles
+                    if not new_profile.contains_email()
+                ],
+            )
+            self.save_profiles(new_profiles)
+            found += len(previews)
+            self.report(page=page_index, profiles=self.count)
+            if self.count >= self.limit:
+                break
+
+        logging.info(
+            f"Info in {self.domain}: Found {found} profiles through the listing API."
+        )
+
+    @span("search_configs")
+    def explore_search_configs(self, driver, driver_pool, name_set, search_configs):
+        """
+        Runs the search configurations, sharded over up to SEARCH_CONFIG_DRIVERS drivers leased from driver_pool while it has idle ones, and one by one on driver otherwise. The job's own driver runs no configuration while there are helpers, since it is kept free for the bio visits of enrich_profiles. Results are saved here, on the job's thread, and only profiles no earlier configuration found are kept. Once some configuration has found profiles, the search stops after SEARCH_CONFIG_PATIENCE configurations in a row find nothing new.
+        """
+        seen_results = set()
+        seen_profiles = set()
+        effective_configs = []
+        stale_count = 0
+        stop = threading.Event()
+
+        with ExitStack() as stack:
+            helpers = []
+            if driver_pool is not None and len(search_configs) > 1:
+                for _ in range(min(SEARCH_CONFIG_DRIVERS, len(search_configs))):
+                    helper = stack.enter_context(driver_pool.lease(blocking=False))
+                    if helper is None:
+                        break
+                    helpers.append(helper)
+            logging.info(
+                f"Info in {self.domain}: Running {len(search_configs)} search configurations on {max(len(helpers), 1)} drivers."
+            )
+
+            for search_config, pages in self.iter_search_config_results(
+                driver, helpers, name_set, search_configs, stop
+            ):
+                if pages is None:
+                    logging.info(f"No results for filter {search_config}.")
+                    new_count = 0
+                else:
+                    new_count = self.save_search_config_results(
+                        driver, name_set, pages, seen_results, seen_profiles
+                    )
+                if new_count:
+                    effective_configs.append(search_config)
+                stale_count = 0 if new_count else stale_count + 1
+                if self.count >= self.limit or (
+                    seen_profiles and stale_count >= SEARCH_CONFIG_PATIENCE
+                ):
+                    stop.set()
+
+        if not seen_profiles:
+            raise Exception(
+                "No filtering configuration was effective."
+            )  # TODO do we always want to raise exception?
+        self.learned["search_configs"] = effective_configs
+
+    def iter_search_config_results(
+        self, driver, helpers, name_set, search_configs, stop
+    ):
+        """
+        Yields (search config, result pages) as the configurations finish, until they run out or stop is set. They run on the helper drivers in parallel if there are any, else one by one on driver. A configuration that fails has no result pages.
+        """
+        # read here, on the job's thread: the helpers must not load expired
+        # attributes through the job's session
+        domain, team_url, limit = self.domain, self.team_url, self.limit
+
+        def run(worker_driver, search_config):
+            try:
+                return self.run_search_config(
+                    worker_driver, domain, team_url, limit, name_set, search_config
+                )
+            except Exception as e:
+                logging.error(f"Error in {domain}: {e}")
+                return None
+
+        if not helpers:
+            for search_config in search_configs:
+                if stop.is_set():
+                    return
+                yield search_config, run(driver, search_config)
+            return
+
+        pending = queue.Queue()
+        for search_config in search_configs:
+            pending.put(search_config)
+        results = queue.Queue()
+        registry = current_job_metrics()
+
+        def work(helper):
+            with job_metrics(registry):
+                try:
+                    while not stop.is_set():
+                        try:
+                            search_config = pending.get_nowait()
+                        except queue.Empty:
+                            return
+                        results.put((search_config, run(helper, search_config)))
+                finally:
+                    results.put(None)  # this helper is done
+
+        with ThreadPoolExecutor(
+            max_workers=len(helpers), thread_name_prefix="search_config"
+        ) as executor:
+            for helper in helpers:
+                executor.submit(work, helper)
+            running = len(helpers)
+            try:
+                while running:
+                    result = results.get()
+                    if result is None:
+                        running -= 1
+                    else:
+                        yield result
+            finally:
+                # also when the consumer raised and closed this generator, so
+                # the executor does not wait for every remaining config
+                stop.set()
+
+    def run_search_config(
+        self, driver, domain, team_url, limit, name_set, search_config
+    ):
+        """
+        Loads the team page on driver, applies search_config, a list of (select index, option text), and harvests the previews on every page of the results, up to limit, or pages the listing API the results came from. Returns [(page url, previews)], or None if the search found no profiles. Touches no database state, so it can run on any thread.
+        """
+        with span("team_page_load"):
+            driver.get(team_url)
+            settle(driver, "team_page")
+        discard_performance_log(driver)
+        select_tags = driver.find_elements(By.TAG_NAME, "select")
+        for select_index, option_text in search_config:
+            logging.info("executing select")
+            Select(select_tags[select_index]).select_by_visible_text(option_text)
+            settle(driver, "select")
+        logging.info("executing search")
+        search_button = self.find_search_button(driver)
+        driver.execute_script("arguments[0].click();", search_button)
+        settle(driver, "search")
+
+        listing_api = self.find_page_listing_api(driver, name_set, domain)
+        if listing_api is not None:
+            pages = []
+            preview_count = 0
+            for _, previews in iter_listing_api(*listing_api, team_url):
+                pages.append((driver.current_url, previews))
+                preview_count += len(previews)
+                if preview_count >= limit:
+                    break
+            return pages
+
+        logging.info("executing scrape")
+        try:
+            profile_class = self.find_profile_selector(driver, name_set)
+        except Exception:
+            return None
+
+        pages = []
+        preview_count = 0
+        page_index = [1]
+        exhausted = [False]
+        prefetch = True  # given up on once it fails, as in scrape_team_page
+        while not exhausted[0] and preview_count < limit:
+            exhausted[0] = True
+            with span("skim"):
+                previews = harvest_previews(driver, profile_class)
+            pages.append((driver.current_url, previews))
+            preview_count += len(previews)
+
+            link = find_next_link(driver, page_index[0])
+            if link is None or preview_count >= limit:
+                break
+            if prefetch:
+                prefetched = list(
+                    iter_prefetched_pages(
+                        parse.urljoin(driver.current_url, link[1] or ""),
+                        page_index[0] + 1,
+                        profile_class,
+                        len(previews),
+                        limit - preview_count,
+                    )
+                )
+                if prefetched:
+                    self.learned["pagination"] = "url"
+                    pages.extend(prefetched)
+                    break
+                prefetch = False
+            self.get_next_if_exists(driver, page_index, exhausted, profile_class, link)
+        return pages
+
+    def save_search_config_results(
+        self, driver, name_set, pages, seen_results, seen_profiles
+    ):
+        """
+        Saves the profiles among the result pages of a search configuration that are not in seen_profiles, and adds them to it. A result set identical to an earlier one, by the hash of its profile urls in seen_results, is skipped outright. Returns the number of new profiles.
+        """
+        keys = [
+            preview_key(hrefs, texts)
+            for _, previews in pages
+            for hrefs, texts in previews
+        ]
+        digest = hashlib.sha1("\n".join(sorted(keys)).encode("utf-8")).hexdigest()
+        if digest in seen_results:
+            logging.info(f"Info in {self.domain}: Skipping an identical result set.")
+            return 0
+        seen_results.add(digest)
+
+        found = 0
+        for location, previews in pages:
+            unseen = []
+            for hrefs, texts in previews:
+                key = preview_key(hrefs, texts)
+                if key not in seen_profiles:
+                    seen_profiles.add(key)
+                    unseen.append((hrefs, texts))
+            new_profiles = self.profiles_from_previews(name_set, unseen, location)
+            self.enrich_profiles(
+                driver,
+                [
+                    new_profile
+                    for new_profile in new_profiles
+                    if not new_profile.contains_email()
+                ],
+            )
+            self.save_profiles(new_profiles)
+            found += len(new_profiles)
+            self.report(profiles=self.count)
+            if self.count >= self.limit:
+                break
+        return found
+
     def find_search_button(self, driver):
         for button in driver.find_elements(By.TAG_NAME, "button"):
             if "search" in button.get_attribute("outerHTML").lower():
@@ -298,103 +927,251 @@ class FirmJob(Base):
             ):
                 return input_tag
 
+    def find_profile_selector(self, driver, name_set):
+        """
+        The recipe's profile selector if it still matches previews on the loaded page, else one derived from the page.
+        """
+        profile_class = self.recipe.get("profile_selector")
+        if profile_class is None or count_matches(driver, profile_class) < 2:
+            with span("profile_selector"):
+                profile_class = get_profile_selector(driver, name_set)
+        self.learned["profile_selector"] = profile_class
+        return profile_class
+
     def scrape_team_page(self, driver, name_set):
         logging.info("Begin get profile class.")
-        profile_class = get_profile_selector(driver, name_set)
+        profile_class = self.find_profile_selector(driver, name_set)
         logging.info(f"Found profile class {profile_class}")
 
         page_index = [1]
 
-        profiles = []
+        found = 0
         exhausted = [False]
+        seen_profiles = set()
+        # given up on once it fails, for the rest of the listing
+        prefetch = True
 
         while not exhausted[0]:
             exhausted[0] = True
 
-            new_profiles = self.skim_team_page(name_set, driver, profile_class)
-            for new_profile in new_profiles:
-                if not new_profile.contains_email():
-                    full_element_href = new_profile.get_full_element_href()
-                    self.visit_full_profile_href(driver, new_profile, full_element_href)
+            new_profiles = self.skim_team_page(
+                name_set, driver, profile_class, seen_profiles
+            )
+            self.enrich_profiles(
+                driver,
+                [
+                    new_profile
+                    for new_profile in new_profiles
+                    if not new_profile.contains_email()
+                ],
+            )
 
-            profiles += new_profiles
+            # saved page by page, so progress survives a crash mid-directory
+            self.save_profiles(new_profiles)
+            found += len(new_profiles)
+            self.report(page=page_index[0], profiles=self.count)
 
-            if len(profiles) == self.limit:
+            if found == self.limit:
                 break
 
-            self.get_next_if_exists(driver, page_index, exhausted)
+            link = find_next_link(driver, page_index[0])
+            if link is None:
+                break
+            if prefetch:
+                prefetched = self.scrape_prefetched_pages(
+                    driver,
+                    name_set,
+                    profile_class,
+                    parse.urljoin(driver.current_url, link[1] or ""),
+                    page_index[0] + 1,
+                    len(new_profiles),
+                    seen_profiles,
+                )
+                if prefetched is not None:
+                    found += prefetched
+                    break
+                prefetch = False
+            self.get_next_if_exists(driver, page_index, exhausted, profile_class, link)
 
         print(f"Info in {self.domain}: Finished")
-        print(f"Info in {self.domain}: Found {len(profiles)} profiles.")
+        print(f"Info in {self.domain}: Found {found} profiles.")
+
+        logging.info(f"Info in {self.domain}: Finished!")
+
+    @span("prefetch")
+    def scrape_prefetched_pages(
+        self,
+        driver,
+        name_set,
+        profile_class,
+        next_url,
+        page_number,
+        per_page,
+        seen_profiles,
+    ):
+        """
+        Scrapes the rest of a listing paged by url from next_url, the url of its page page_number, fetching the pages concurrently over plain HTTP instead of clicking through them (see iter_prefetched_pages). Returns the number of profiles found, or None if the listing is not paged by url or rendered by javascript, for the caller to click through it instead.
+        """
+        found = None
+        for page_url, previews in iter_prefetched_pages(
+            next_url, page_number, profile_class, per_page, self.limit - self.count
+        ):
+            new_profiles = self.profiles_from_previews(
+                name_set, previews, page_url, seen_profiles
+            )
+            if not new_profiles:
+                break  # e.g. served the first page again
+            self.enrich_profiles(
+                driver,
+                [
+                    new_profile
+                    for new_profile in new_profiles
+                    if not new_profile.contains_email()
+                ],
+            )
+            self.save_profiles(new_profiles)
+            found = (found or 0) + len(new_profiles)
+            self.report(page=page_number, profiles=self.count)
+            page_number += 1
+            if self.count >= self.limit:
+                break
+        if found is not None:
+            self.learned["pagination"] = "url"
+        return found
+
+    @span("db_write")
+    def save_profiles(self, profiles):
+        """
+        Persists a page (or batch) of profiles, along with the job's progress, in a single transaction. The rows are inserted in bulk; if that fails, they are retried one savepoint each so a bad row only loses itself.
+        """
+        count = self.count
+        db_session.add_all(profiles)
+        try:
+            db_session.flush()
+            insert_contact_points(profiles)
+            db_session.commit()
+            return
+        except Exception as e:
+            db_session.rollback()
+            self.count = count  # the rollback expired it
+            logging.warning(
+                f"Info in {self.domain}: Bulk insert failed, retrying per row: {e}"
+            )
+
         for profile in profiles:
-            db_session.add(profile)
             try:
-                db_session.commit()
-            except:
-                db_session.rollback()
+                with db_session.begin_nested():
+                    db_session.add(profile)
+                    db_session.flush()
+                    insert_contact_points([profile])
+            except Exception as e:
+                logging.error(f"Error in {self.domain}: Dropped a profile: {e}")
+        db_session.commit()
 
-        logging.info(f"Info in {self.domain}: Finished!")
+    @span("enrich_profiles")
+    def enrich_profiles(self, driver, profiles):
+        """
+        Collects the links on the full profile page of each profile. The pages are fetched concurrently over plain HTTP; only those that yield no email or linkedin (e.g. rendered by javascript, or blocked) are visited in the browser, if there is one.
+        """
+        full_element_hrefs = [profile.get_full_element_href() for profile in profiles]
+        pages = fetch_pages(full_element_hrefs)
+        browser_visits = 0
+        for profile, full_element_href in zip(profiles, full_element_hrefs):
+            page = pages.get(full_element_href)
+            hrefs = extract_hrefs(page) if page else []
+            if any(is_contact_href(href) for href in hrefs):
+                profile.update_with_hrefs(hrefs)
+            elif driver is not None:
+                browser_visits += 1
+                self.visit_full_profile_href(driver, profile, full_element_href)
+        logging.info(
+            f"Info in {self.domain}: Enriched {len(profiles)} profiles, {browser_visits} needed the browser."
+        )
 
+    @span("bio_visits")
     def visit_full_profile_href(self, driver, profile, full_element_href):
         main_handle = driver.current_window_handle
         driver.switch_to.new_window("tab")
-        driver.get(full_element_href)
-        root = driver.find_element(By.XPATH, "/*")  # the root element
-
-        profile.update_with_full_element(root)
+        try:
+            driver.get(full_element_href)
+            root = driver.find_element(By.XPATH, "/*")  # the root element
 
-        driver.close()
-        driver.switch_to.window(main_handle)
+            profile.update_with_full_element(root)
+        finally:
+            driver.close()
+            driver.switch_to.window(main_handle)
+
+    @span("skim")
+    def skim_team_page(self, name_set, driver, profile_class, seen_profiles=None):
+        previews = harvest_previews(driver, profile_class)
+        return self.profiles_from_previews(
+            name_set, previews, driver.current_url, seen_profiles
+        )
 
-    def skim_team_page(self, name_set, driver, profile_class):
+    def profiles_from_previews(self, name_set, previews, location, seen_profiles=None):
+        """
+        Profiles for the valid previews among previews, as [hrefs, child texts] pairs, up to the job's limit. Previews whose preview_key is in seen_profiles, if given, are skipped, and the others' added to it.
+        """
         new_profiles = []
-        preview_elements = driver.find_elements(
-            By.CSS_SELECTOR, profile_class
-        )  # we could also modify the page. just a thought. Also, does this have a limited size?
         logging.info(
-            f"Info in {self.domain}: Found {len(preview_elements)} profile candidates."
+            f"Info in {self.domain}: Found {len(previews)} profile candidates."
         )
-        for preview_element in preview_elements:
-            profile = PersonalProfile(driver.current_url, self.firm_type, self.id)
-            profile.update_with_preview_element(preview_element)
+        for hrefs, texts in previews:
+            if seen_profiles is not None:
+                key = preview_key(hrefs, texts)
+                if key in seen_profiles:
+                    continue
+                seen_profiles.add(key)
+            profile = PersonalProfile(location, self.firm_type, self.id)
+            profile.update_with_preview_data(hrefs, texts)
 
             if not profile.is_invalid:
                 self.count += 1
                 if self.count > self.limit:
                     return new_profiles
-                text_nodes_text = profile.get_text_nodes_text(preview_element)
-                profile.update_with_text_nodes(name_set, text_nodes_text)
+                profile.update_with_text_nodes(name_set, texts)
                 new_profiles.append(profile)
-
-            driver.execute_script(
-                "arguments[0].setAttribute('class', 'GARBAGE')", preview_element
-            )  # HACK this is an important feature - it ensures that we don't re-parse old profiles, for websites that keep us on the same DOM with pagination.
         return new_profiles
 
-    def get_next_if_exists(self, driver, page_index, exhausted):
-        next_page_elements = driver.find_elements(By.TAG_NAME, "a")
-        for next_page_element in next_page_elements:
-            if next_page_element.text.lower() == "more":
-                exhausted[0] = False
-                print(next_page_element.text)
-                driver.execute_script(
-                    "arguments[0].click();", next_page_element
-                )  # HACK this raw click seems to be more reliable than selenium's
-                time.sleep(5)
-                print("Clicked next!")
-                print(f"Current url is: {driver.current_url}")
-                return
-            elif next_page_element.text.lower() == str(page_index[0] + 1):
-                exhausted[0] = False
-                print(next_page_element.text)
-                driver.execute_script(
-                    "arguments[0].click();", next_page_element
-                )  # HACK this raw click seems to be more reliable than selenium's
-                time.sleep(5)
-                print("Clicked next!")
-                print(f"Current url is: {driver.current_url}")
-                page_index[0] += 1
-                return
+    @span("pagination")
+    def get_next_if_exists(
+        self, driver, page_index, exhausted, profile_class, link=None
+    ):
+        """
+        Clicks through to the next page, by link if already found with find_next_link, and waits for it to settle.
+        """
+        if link is None:
+            link = find_next_link(driver, page_index[0])
+        if link is None:
+            return
+        index, href, label = link
+        exhausted[0] = False
+        self.learned.setdefault("pagination", "click")
+        print(label)
+        click_link(driver, index)
+        settle(driver, "pagination", profile_class)
+        print("Clicked next!")
+        print(f"Current url is: {driver.current_url}")
+        if label != "more":
+            page_index[0] += 1
+
+
+def preview_key(hrefs, texts):
+    """
+    Identifies the profile of a preview across searches: the first of its links that is not a contact link, which is normally its full profile page, or else its texts.
+    """
+    for href in hrefs:
+        if href and not is_contact_href(href):
+            return href
+    return "\t".join(texts)
+
+
+def is_linkedin_href(href):
+    return "linkedin" in href or "linked.in" in href
+
+
+def is_contact_href(href):
+    return "mailto" in href or is_linkedin_href(href)
 
 
 class PersonalProfile(Base):
@@ -407,94 +1184,89 @@ class PersonalProfile(Base):
     name = Column(String(100))
     is_key = Column(Boolean)
 
-    emails = Column(String(1000), default=text(""))  # Can append multiple as required
-    linkedins = Column(String(1000), default=text(""))
-    others = Column(String(1000), default=text(""))
-
     is_invalid = Column(Boolean)
 
-    job_id = Column(Integer, ForeignKey("jobs.id"))
+    job_id = Column(Integer, ForeignKey("jobs.id"), index=True)
     job = relationship("FirmJob", back_populates="profiles")
+    contact_points = relationship(
+        "ContactPoint", back_populates="profile", order_by="ContactPoint.id"
+    )
 
     def __init__(self, url, firm_type, job_id):
         self.location = url
         self.firm_type = firm_type
         self.job_id = job_id
 
-        self.emails = ""
-        self.linkedins = ""
-        self.others = ""
+        self._contacts = {kind: {} for kind in ContactKind}
+
+    @reconstructor
+    def init_on_load(self):
+        self._contacts = None
+
+    @property
+    def contacts(self):
+        """
+        The profile's contact values by kind, each an insertion ordered set (a dict with None values). Loaded profiles read theirs from contact_points on first use.
+        """
+        if self._contacts is None:
+            self._contacts = {kind: {} for kind in ContactKind}
+            for contact_point in self.contact_points:
+                self._contacts[contact_point.kind][contact_point.value] = None
+        return self._contacts
 
     def add_email(self, email):
         logging.info("Entering email")
-        if self.emails == "":
-            self.emails = email
-        else:
-            self.emails += f";{email}"
+        self.contacts[ContactKind.EMAIL][email] = None
 
     def add_linkedin(self, linkedin):
         logging.info("Entering linkedin")
-        if self.linkedins == "":
-            self.linkedins = linkedin
-        else:
-            self.linkedins += f";{linkedin}"
+        self.contacts[ContactKind.LINKEDIN][linkedin] = None
 
     def add_other_anchor(self, anchor):
         logging.info("Entering other anchor")
-        if self.others == "":
-            self.others = anchor
-        else:
-            self.others += f";{anchor}"
+        self.contacts[ContactKind.OTHER][anchor] = None
 
     def contains_email(self):
-        return len(self.emails) > 0
+        return len(self.contacts[ContactKind.EMAIL]) > 0
 
-    def is_likely_profile_preview(self, text_nodes, anchors):
-        return not (
-            len(anchors) > 10 or len(text_nodes) == 1 and text_nodes[0].text == ""
-        )
-
-    def get_text_nodes_text(self, preview_element):
-        text_nodes = preview_element.find_elements(By.XPATH, "child::*")
-        text_nodes_text = []
-        for text_node in text_nodes:
-            text = text_node.text
-            text_nodes_text.append(text)
-        return text_nodes_text
+    def is_likely_profile_preview(self, texts, hrefs):
+        return not (len(hrefs) > 10 or len(texts) == 1 and texts[0] == "")
 
     def get_full_element_href(self):
-        return parse.urljoin(self.location, self.others.split(";")[0])
+        others = self.contacts[ContactKind.OTHER]
+        return parse.urljoin(self.location, next(iter(others), ""))
+
+    def add_href(self, href):
+        if is_linkedin_href(href):
+            self.add_linkedin(href)
+        elif "mailto" in href:
+            self.add_email(href)
+        else:
+            self.add_other_anchor(href)
 
-    def update_with_preview_element(self, preview_element):  # NONETYPE + str ?
+    def update_with_preview_data(self, hrefs, texts):
+        """
+        Updates from a preview harvested by harvest_previews: the hrefs of its anchors and the texts of its children.
+        """
         logging.info(f"Entering preview update.")
-        anchors = preview_element.find_elements(By.TAG_NAME, "a")
-        text_nodes = preview_element.find_elements(By.XPATH, "child::*")
-        if not self.is_likely_profile_preview:
-            self.is_invalid = True
-        for anchor in anchors:
-            anchor_html = anchor.get_attribute("outerHTML").lower()
-            href = anchor.get_dom_attribute("href")
+        self.is_invalid = not self.is_likely_profile_preview(texts, hrefs)
+        for href in hrefs:
             if href is not None:  # tentative for javascript, you get the idea
-                if "linkedin" in href or "linked.in" in href:
-                    self.add_linkedin(href)
-                elif "mailto" in href:
-                    self.add_email(href)
-                    print(f"Got email: {href}")
-                else:
-                    self.add_other_anchor(href)
+                self.add_href(href)
 
     def update_with_full_element(self, full_element):
         anchors = full_element.find_elements(By.TAG_NAME, "a")
         for anchor in anchors:
-            anchor_html = anchor.get_attribute("outerHTML").lower()
             href = anchor.get_dom_attribute("href")
             if href is not None:  # tentative for javascript, you get the idea
-                if "linkedin" in href or "linked.in" in href:
-                    self.add_linkedin(href)
-                elif "mailto" in href:
-                    self.add_email(href)
-                else:
-                    self.add_other_anchor(href)
+                self.add_href(href)
+
+    def update_with_hrefs(self, hrefs):
+        """
+        Updates from the anchor hrefs of a full profile page fetched without the browser.
+        """
+        for href in hrefs:
+            self.add_href(href)
 
     def update_with_text_nodes(self, name_set, text_nodes_text):
         keylist = []
@@ -517,3 +1289,40 @@ class PersonalProfile(Base):
                 if line.lower() in keylist:
                     self.is_key = True
                     print("Likely a key person.")
+
+
+class ContactPoint(Base):
+    __tablename__ = "contact_points"
+    __table_args__ = (UniqueConstraint("profile_id", "kind", "value"),)
+
+    id = Column(Integer, primary_key=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
+    kind = Column(Enum(ContactKind), nullable=False)
+    value = Column(String, nullable=False)
+
+    profile = relationship("PersonalProfile", back_populates="contact_points")
+
+
+# The submissions (see add_view) that asked for each job. A domain submitted
+# again in a later batch stays in the earlier ones too.
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    batch_id = Column(String(32), primary_key=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), primary_key=True, index=True)
+
+
+def insert_contact_points(profiles):
+    """
+    Inserts the contact points of flushed profiles in one statement, skipping any already stored.
+    """
+    rows = [
+        {"profile_id": profile.id, "kind": kind, "value": value}
+        for profile in profiles
+        for kind, values in profile.contacts.items()
+        for value in values
+    ]
+    if rows:
+        db_session.execute(
+            ContactPoint.__table__.insert().prefix_with("OR IGNORE"), rows
+        )
@@ -0,0 +1,112 @@
+import logging
+import mmap
+import os
+import sys
+import threading
+from array import array
+
+from .constants import NAMES_FILE, NAMES_INDEX_FILE
+
+# Index layout: MAGIC, the name count as a native uint32, count + 1 native
+# uint32 offsets into the blob, then the blob of sorted, utf-8 encoded names.
+# The byte order is part of the 8 byte magic, so an index copied between
+# machines is rebuilt rather than misread.
+MAGIC = b"FSNAME" + (b"L" if sys.byteorder == "little" else b"B") + b"1"
+
+
+def build_name_index(names_file=NAMES_FILE, index_file=NAMES_INDEX_FILE):
+    with open(names_file, "rb") as f:
+        names = sorted({line.strip().lower() for line in f if line.strip()})
+    offsets = array("I", [0])
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    # Write to a temporary file and rename, so concurrent builders and readers
+    # never see a partial index.
+    tmp_file = f"{index_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(MAGIC)
+        f.write(array("I", [len(names)]).tobytes())
+        f.write(offsets.tobytes())
+        f.write(b"".join(names))
+    os.replace(tmp_file, index_file)
+    logging.info(f"Built name index of {len(names)} names at {index_file}.")
+
+
+class NameIndex:
+    """
+    Read-only set of lowercase names backed by a memory-mapped sorted index, so every worker process shares the same pages. Supports `in`, like the set it replaces. The index is (re)built from names_file on first use if it is missing or out of date.
+    """
+
+    def __init__(self, index_file=NAMES_INDEX_FILE, names_file=NAMES_FILE):
+        self.index_file = index_file
+        self.names_file = names_file
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._offsets = None
+        self._blob_start = 0
+
+    def _load(self):
+        with self._lock:
+            if self._mmap is not None:
+                return
+            if self._is_stale():
+                build_name_index(self.names_file, self.index_file)
+            with open(self.index_file, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(data)
+            header = len(MAGIC) + 4
+            count = view[len(MAGIC) : header].cast("I")[0]
+            offsets_end = header + 4 * (count + 1)
+            self._offsets = view[header:offsets_end].cast("I")
+            self._blob_start = offsets_end
+            self._mmap = data
+
+    def _is_stale(self):
+        if not os.path.exists(self.index_file):
+            return True
+        if os.path.exists(self.names_file) and os.path.getmtime(
+            self.names_file
+        ) > os.path.getmtime(self.index_file):
+            return True
+        with open(self.index_file, "rb") as f:
+            return f.read(len(MAGIC)) != MAGIC
+
+    def __contains__(self, name):
+        if self._mmap is None:
+            self._load()
+        key = name.encode("utf-8")
+        offsets = self._offsets
+        data = self._mmap
+        start = self._blob_start
+        lo = 0
+        hi = len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = data[start + offsets[mid] : start + offsets[mid + 1]]
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __len__(self):
+        if self._mmap is None:
+            self._load()
+        return len(self._offsets) - 1
+
+
+_name_index = NameIndex()
+
+
+def get_name_index():
+    """
+    The process-wide NameIndex. Cheap to call: nothing is read until the first lookup.
+    """
+    return _name_index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=20)
+    build_name_index()
@@ -0,0 +1,155 @@
+"""
+Live job progress.
+
+Running FirmJobs publish progress events (strategy, page, profile count) on the process's event_bus. Workers run in their own processes, so the events reach the web app through the jobs table: a ProgressWriter in each worker batches them into one write every PROGRESS_WRITE_SECONDS, and the ProgressRelay in the web app reads back whatever changed every PROGRESS_POLL_SECONDS and republishes it on the web app's event_bus, which /jobs/events streams to browsers. However many pages are open, the database sees one small query per interval.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam
+
+from firm_scrape.database import db_session, engine
+from firm_scrape.models import FirmJob
+from .constants import PROGRESS_POLL_SECONDS, PROGRESS_WRITE_SECONDS
+from .events import event_bus
+from .listing import jobs_to_dicts
+
+
+class ProgressWriter:
+    """
+    Persists the "progress" events of this process's jobs to jobs.progress, merging each job's events and writing all changed jobs in one transaction per interval. A job's merged progress is forgotten once it has been written after the job finished, see finish.
+    """
+
+    def __init__(self, bus=event_bus, interval=PROGRESS_WRITE_SECONDS):
+        self.bus = bus
+        self.interval = interval
+        self._progress = {}
+        self._finished = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._subscriber = None
+        self._thread = None
+
+    def start(self):
+        self._subscriber = self.bus.subscribe("progress")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.bus.unsubscribe("progress", self._subscriber)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Failed to write job progress: {e}")
+
+    def finish(self, job_id):
+        """
+        Marks job_id as finished, so its progress is dropped after the next write. Its job has published its last event by then, so nothing of it is lost.
+        """
+        with self._lock:
+            self._finished.add(job_id)
+
+    def flush(self):
+        # taken before draining, so every event of these jobs is drained too
+        with self._lock:
+            finished = set(self._finished)
+        changed = set()
+        while True:
+            try:
+                event = self._subscriber.get_nowait()
+            except queue.Empty:
+                break
+            progress = dict(event)
+            job_id = progress.pop("id")
+            self._progress.setdefault(job_id, {}).update(progress)
+            changed.add(job_id)
+        if changed:
+            now = datetime.now()
+            with engine.begin() as con:
+                con.execute(
+                    FirmJob.__table__.update()
+                    .where(FirmJob.__table__.c.id == bindparam("job_id"))
+                    .values(progress=bindparam("progress"), updated_at=now),
+                    [
+                        {
+                            "job_id": job_id,
+                            "progress": json.dumps(self._progress[job_id]),
+                        }
+                        for job_id in changed
+                    ],
+                )
+        # only once written, so a failed write is retried with the whole state
+        for job_id in finished:
+            self._progress.pop(job_id, None)
+        with self._lock:
+            self._finished -= finished
+
+
+class ProgressRelay:
+    """
+    Polls the jobs table for jobs updated since the last poll and publishes them on the bus's "jobs" topic. Runs only while someone is subscribed to it.
+    """
+
+    def __init__(self, bus=event_bus, interval=PROGRESS_POLL_SECONDS):
+        self.bus = bus
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._since = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        self._since = datetime.now()
+        sent = {}
+        while True:
+            with self._lock:
+                if not self.bus.has_subscribers("jobs"):
+                    self._thread = None
+                    return
+            try:
+                sent = self.poll(sent)
+            except Exception as e:
+                logging.error(f"Failed to relay job progress: {e}")
+                db_session.rollback()
+            finally:
+                db_session.remove()
+            time.sleep(self.interval)
+
+    def poll(self, sent):
+        # Overlap the previous poll a little, so a commit that lands with an
+        # older timestamp than one already seen is not missed. sent filters
+        # out the repeats.
+        jobs = (
+            FirmJob.query.filter(
+                FirmJob.updated_at >= self._since - timedelta(seconds=self.interval)
+            )
+            .order_by(FirmJob.updated_at)
+            .all()
+        )
+        latest = {}
+        for event in jobs_to_dicts(jobs):
+            latest[event["id"]] = event
+            if sent.get(event["id"]) != event:
+                self.bus.publish("jobs", event)
+        if jobs:
+            self._since = max(self._since, jobs[-1].updated_at)
+        return latest
+
+
+progress_relay = ProgressRelay()
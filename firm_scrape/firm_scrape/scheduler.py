@@ -0,0 +1,66 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from firm_scrape.database import db_session
+from firm_scrape.models import FirmJob
+from .constants import MAX_CONCURRENT_JOBS
+from .drivers import DriverPool
+from .jobqueue import finish_job, prepare_run, release_job
+from .metrics import job_metrics, span
+
+
+class JobScheduler:
+    """
+    Runs claimed FirmJobs in parallel on a bounded pool of worker threads. Jobs that need a browser lease a warm Chrome from a DriverPool of the same size for the rest of their run.
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="firm_job"
+        )
+        self.driver_pool = DriverPool(max_workers)
+
+    def submit(self, job_id, name_set):
+        return self._executor.submit(self._run_job, job_id, name_set)
+
+    def _run_job(self, job_id, name_set):
+        with job_metrics() as timings:
+            self._execute_job(job_id, name_set)
+        try:
+            summary = timings.summary()
+            FirmJob.query.filter_by(id=job_id).update(
+                {FirmJob.timings: json.dumps(summary)}, synchronize_session=False
+            )
+            db_session.commit()
+            logging.info(f"Timings of job {job_id}: {summary}")
+        except Exception as e:
+            logging.error(f"Failed to save timings of job {job_id}: {e}")
+            db_session.rollback()
+        finally:
+            # scoped_session is thread-local, so every job gets a clean session.
+            db_session.remove()
+
+    def _execute_job(self, job_id, name_set):
+        try:
+            firm_job = FirmJob.query.filter_by(id=job_id).one()
+            logging.info(f"Info in {firm_job.domain}: Starting job {job_id}.")
+            with span("prepare"):
+                prepare_run(firm_job)
+            with span("execute"):
+                firm_job.execute(name_set, self.driver_pool)
+            finish_job(firm_job)
+            db_session.commit()
+        except Exception as e:
+            logging.error(f"Error in job {job_id}: {e}")
+            db_session.rollback()
+            try:
+                release_job(job_id, str(e))
+            except Exception as e:
+                logging.error(f"Failed to release job {job_id}: {e}")
+                db_session.rollback()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self.driver_pool.close()
@@ -0,0 +1,115 @@
+"""
+Browserless counterparts of the WebDriver steps of the team page strategy, working on DomSnapshots of HTML fetched over plain HTTP. FirmJob.execute_static_strategy runs them first, and a Chrome is only leased for firms whose directories need javascript.
+"""
+
+import hashlib
+import math
+import re
+from urllib import parse
+
+from .api import PAGE_PARAMS
+from .constants import FETCH_PER_HOST
+from .dom import DomSnapshot
+from .fetch import fetch_pages
+
+
+def fetch_snapshot(url):
+    """
+    A snapshot of the page at url, or None if it could not be fetched.
+    """
+    html = fetch_pages([url]).get(url)
+    if html is None:
+        return None
+    return DomSnapshot.from_html(html)
+
+
+def anchor_hrefs(snapshot):
+    return [node.href for node in snapshot.nodes if node.tag == "a" and node.href]
+
+
+def harvest_static_previews(snapshot, profile_selector):
+    """
+    The hrefs and child texts of every profile preview, like harvest_previews.
+    """
+    previews = []
+    for node in snapshot.select(profile_selector):
+        hrefs = [
+            descendant.href
+            for descendant in _descendants(node)
+            if descendant.tag == "a"
+        ]
+        texts = [child.inner_text or "" for child in node.children]
+        previews.append([hrefs, texts])
+    return previews
+
+
+def find_next_page_href(snapshot, page_index):
+    """
+    The href of the link to the next page, by the same rules as util.find_next_link: a "more" link, or one labelled with the next page number.
+    """
+    for node in snapshot.nodes:
+        if node.tag != "a" or not node.href:
+            continue
+        label = (node.inner_text or "").lower()
+        if label == "more" or label == str(page_index + 1):
+            return node.href
+    return None
+
+
+def paged_url(url, page_number, target):
+    """
+    The url of page target of a listing, given url, that of its page page_number, with the number in a page query parameter (?page=N) or path segment (/page/N). None if url has the number in neither.
+    """
+    parsed = parse.urlparse(url)
+    query = parse.parse_qsl(parsed.query, keep_blank_values=True)
+    for position, (key, value) in enumerate(query):
+        if key.lower() in PAGE_PARAMS and value == str(page_number):
+            query[position] = (key, str(target))
+            return parse.urlunparse(parsed._replace(query=parse.urlencode(query)))
+    path, found = re.subn(
+        rf"/page/{page_number}(?=/|$)", f"/page/{target}", parsed.path, count=1
+    )
+    if found:
+        return parse.urlunparse(parsed._replace(path=path))
+    return None
+
+
+def iter_prefetched_pages(url, page_number, profile_selector, per_page, remaining):
+    """
+    Yields (url, previews) for the pages of a listing from page_number on, given url, that of page page_number, fetching them concurrently, FETCH_PER_HOST at a time and no more than the remaining profiles need at per_page a page. Stops at the first page that fails, has no previews or repeats an earlier one, so nothing is yielded for listings rendered by javascript, or not paged by url.
+    """
+    if paged_url(url, page_number, page_number) is None:
+        return
+    seen_pages = set()
+    number = page_number
+    while remaining > 0:
+        batch = FETCH_PER_HOST
+        if not math.isinf(remaining):  # an unlimited job's limit is inf
+            batch = min(batch, math.ceil(remaining / max(per_page, 1)))
+        urls = [
+            paged_url(url, page_number, target)
+            for target in range(number, number + batch)
+        ]
+        pages = fetch_pages(urls)
+        for target_url in urls:
+            html = pages.get(target_url)
+            if html is None:
+                return
+            previews = harvest_static_previews(
+                DomSnapshot.from_html(html), profile_selector
+            )
+            digest = hashlib.sha1(repr(previews).encode("utf-8")).hexdigest()
+            if not previews or digest in seen_pages:
+                return  # past the last page, which some sites serve again
+            seen_pages.add(digest)
+            remaining -= len(previews)
+            yield target_url, previews
+        number += batch
+
+
+def _descendants(node):
+    stack = list(reversed(node.children))
+    while stack:
+        descendant = stack.pop()
+        yield descendant
+        stack.extend(reversed(descendant.children))
@@ -1,10 +1,12 @@
 from datetime import timedelta
 from functools import update_wrapper
 import logging
+import threading
 from flask import Flask, g, render_template, request, make_response, current_app
 import undetected_chromedriver as uc  # present in the docker container
 import re
 from .constants import NAME_LIMIT
+from .dom import DomSnapshot
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 
@@ -70,8 +72,15 @@ def crossdomain(
     return decorator
 
 
+# undetected_chromedriver patches a shared chromedriver binary on startup, so
+# concurrent launches from several job threads must be serialized.
+_webdriver_lock = threading.Lock()
+
+
 def setup_webdriver() -> uc.Chrome:
     options = uc.ChromeOptions()
+    # network events, for finding the JSON APIs behind directories (see api.py)
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     options.arguments.extend(
         [
             "--disable-extensions",
@@ -82,93 +91,151 @@ def setup_webdriver() -> uc.Chrome:
             "--disable-dev-shm-usage",
         ]
     )
-    driver = uc.Chrome(options, version_main=111)
+    with _webdriver_lock:
+        driver = uc.Chrome(options, version_main=111)
     driver.set_page_load_timeout(20)
     return driver
 
 
 def get_profile_selector(driver, name_set):
-    name_elements = get_name_elements(driver, name_set)
+    """
+    Derives a CSS selector matching each profile preview on the current page, from a single snapshot of the DOM.
+    """
+    return derive_profile_selector(DomSnapshot.from_driver(driver), name_set)
+
+
+def derive_profile_selector(snapshot, name_set):
+    """
+    Walks up from consecutive pairs of name nodes to their lowest common ancestor. The children of that ancestor on the two paths are previews; their common classes become the selector, or failing that, their tag path from the root.
+    """
+    name_nodes = get_name_nodes(snapshot, name_set)
 
     name_selector = ""
     name_selector_shadow = ""
     name_1 = None
     name_2 = None
-    name_1_parent = None
-    name_2_parent = None
 
-    for i in range(0, len(name_elements) - 1):
-        name_1 = name_elements[i]
-        name_2 = name_elements[i + 1]
-        name_selector = f"{name_1.tag_name}"
+    for i in range(0, len(name_nodes) - 1):
+        name_1 = name_nodes[i]
+        name_2 = name_nodes[i + 1]
+        name_selector = f"{name_1.tag}"
         name_selector_shadow = ""
 
-        name_1_parent = name_1.find_element(By.XPATH, "./..")
-        name_2_parent = name_2.find_element(By.XPATH, "./..")
-
-        try:
-            while (
-                name_1_parent != name_2_parent
-            ):  # uses elementid under the hood ssssss
-                name_1 = name_1.find_element(By.XPATH, "./..")
-                name_2 = name_2.find_element(By.XPATH, "./..")
-                name_1_parent = name_1_parent.find_element(By.XPATH, "./..")
-                name_2_parent = name_2_parent.find_element(By.XPATH, "./..")
-                name_selector_shadow = name_selector
-                name_selector = f"{name_1.tag_name} > " + name_selector
-        except:
-            logging.info(f"Info: Failed - trying again with next name window")
-            continue
-        break
+        name_1_parent = name_1.parent
+        name_2_parent = name_2.parent
+
+        while name_1_parent is not name_2_parent:
+            if name_1_parent is None or name_2_parent is None:
+                break  # ran past the root on one side
+            name_1 = name_1.parent
+            name_2 = name_2.parent
+            name_1_parent = name_1_parent.parent
+            name_2_parent = name_2_parent.parent
+            name_selector_shadow = name_selector
+            name_selector = f"{name_1.tag} > " + name_selector
+        else:
+            break
+        logging.info(f"Info: Failed - trying again with next name window")
 
     if name_1 is None or name_2 is None:
         raise Exception(f"Not enough names to gain structure.")
 
-    common = return_token_intersection(
-        name_1.get_attribute("class").split(), name_2.get_attribute("class").split()
-    )
+    common = return_token_intersection(name_1.classes, name_2.classes)
 
     common = css_classtokens2selector(common)
 
     if common != ".":
         # drill down to avoid weirdness like an unbalanced DOM tree hierarchy
-        count = len(name_1.find_elements(By.TAG_NAME, "a"))
-        name_1_children = name_1.find_elements(By.XPATH, "child::*")
-        if len(name_1_children) != 1:
-            return css_classtokens2selector(name_1.get_attribute("class").split())
-        name_1_child = name_1_children[0]
-        child_count = len(name_1_child.find_elements(By.TAG_NAME, "a"))
+        count = name_1.anchor_count
+        if len(name_1.children) != 1:
+            return css_classtokens2selector(name_1.classes)
+        name_1_child = name_1.children[0]
+        child_count = name_1_child.anchor_count
         while count == child_count:
             name_1 = name_1_child
             count = child_count
-            name_1_children = name_1.find_elements(By.XPATH, "child::*")
-            if len(name_1_children) != 1:
-                return css_classtokens2selector(name_1.get_attribute("class").split())
-            name_1_child = name_1_children[0]
-            child_count = len(name_1_child.find_elements(By.TAG_NAME, "a"))
+            if len(name_1.children) != 1:
+                return css_classtokens2selector(name_1.classes)
+            name_1_child = name_1.children[0]
+            child_count = name_1_child.anchor_count
 
         return common
 
     else:
         # throw out common, it is empty
-        profile_selector = f"{name_1.tag_name}"
+        profile_selector = f"{name_1.tag}"
 
         # traverse upwards until we hit the root
-        while True:
-            try:
-                name_1 = name_1.find_element(By.XPATH, "./..")
-                profile_selector = f"{name_1.tag_name} > " + profile_selector
-            except:
-                break
-        print(profile_selector)
+        ancestor = name_1.parent
+        while ancestor is not None:
+            profile_selector = f"{ancestor.tag} > " + profile_selector
+            ancestor = ancestor.parent
         name_selector = profile_selector + " > " + name_selector_shadow
-        print(name_selector)
+        logging.info(f"Info: Derived name selector {name_selector}")
 
         logging.info(f"Info: Derived profile selector {profile_selector}")
 
         return profile_selector
 
 
+# For every element matching the selector, returns [anchor hrefs, child texts]
+# and renames its class to GARBAGE, so pages that keep the same DOM across
+# pagination do not hand us the same previews again.
+HARVEST_PREVIEWS_SCRIPT = """
+const previews = [];
+for (const el of document.querySelectorAll(arguments[0])) {
+    const hrefs = Array.from(el.getElementsByTagName("a"), (a) => a.getAttribute("href"));
+    const texts = Array.from(el.children, (child) =>
+        child.getClientRects().length > 0 ? child.innerText : ""
+    );
+    previews.push([hrefs, texts]);
+    el.setAttribute("class", "GARBAGE");
+}
+return previews;
+"""
+
+
+def harvest_previews(driver, profile_selector):
+    """
+    Collects the hrefs and child texts of every profile preview on the page, and marks them consumed, in a single WebDriver call.
+    """
+    return driver.execute_script(HARVEST_PREVIEWS_SCRIPT, profile_selector)
+
+
+# The label and href of every anchor on the page, in document order.
+NEXT_LINKS_SCRIPT = """
+return Array.from(document.getElementsByTagName("a"), (a) => [
+    a.innerText.trim().toLowerCase(),
+    a.getAttribute("href"),
+]);
+"""
+
+CLICK_LINK_SCRIPT = """
+document.getElementsByTagName("a")[arguments[0]].click();
+"""
+
+
+def find_next_link(driver, page_index):
+    """
+    The link to the page after page_index, as (index among the page's anchors, href, label): a "more" link, or one labelled with the next page number. Reads every anchor in a single WebDriver call. None if there is none.
+    """
+    for index, (label, href) in enumerate(driver.execute_script(NEXT_LINKS_SCRIPT)):
+        if label == "more" or label == str(page_index + 1):
+            return index, href, label
+    return None
+
+
+def count_matches(driver, selector):
+    return driver.execute_script(
+        "return document.querySelectorAll(arguments[0]).length;", selector
+    )
+
+
+def click_link(driver, index):
+    # HACK this raw click seems to be more reliable than selenium's
+    driver.execute_script(CLICK_LINK_SCRIPT, index)
+
+
 def return_token_intersection(tokens1, tokens2):
     tokens1_set = set()
     tokens2_set = set()
@@ -184,30 +251,31 @@ def css_classtokens2selector(classtokens):
     return "." + selector
 
 
-def get_name_elements(driver, name_set):
-    elements = driver.find_elements(
-        By.XPATH, "//*[text()]"
-    )  # TODO this query is inefficient
+def count_names(driver, name_set):
+    """
+    The number of distinct names shown on the current page.
+    """
+    return len(get_name_nodes(DomSnapshot.from_driver(driver), name_set, limit=None))
+
+
+def get_name_nodes(snapshot, name_set, limit=NAME_LIMIT):
     name_regex = re.compile(r"^[a-zA-Z]+( [A-Z] | )[a-zA-Z]+$")
     names = []
     names_backing_set = set()
-    for element in elements:
-        test = re.sub(r"\.|,", "", element.text)
-        print(test)
+    for node in snapshot.text_nodes():
+        test = re.sub(r"\.|,", "", node.text)
         match_huh = name_regex.match(test)
         if match_huh:
             match = match_huh.group(0)
             if is_name(match, name_set):
                 print(f"{match} found in name dictionary")
-                if element.text not in names_backing_set:
-                    names.append(element)
-                    names_backing_set.add(element.text)
-                    if len(names) > NAME_LIMIT:
-                        print(f"Found {NAME_LIMIT} names, exiting namesearch.")
+                if node.text not in names_backing_set:
+                    names.append(node)
+                    names_backing_set.add(node.text)
+                    if limit is not None and len(names) > limit:
+                        print(f"Found {limit} names, exiting namesearch.")
                         break
-    for name in names:
-        print(name.text)
-    return list(names)
+    return names
 
 
 def is_name(pot_name: str, name_set) -> bool:
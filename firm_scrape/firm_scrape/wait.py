@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+from .constants import WAIT_QUIET_MS, WAIT_TIMEOUT
+
+# Resolves once the document is complete, no fetch/XHR is in flight, no new
+# resources were loaded and nothing under the observed element mutated for
+# quietMs, or once timeoutMs has passed. Runs entirely in the browser, so a
+# whole wait costs one WebDriver round trip.
+SETTLE_SCRIPT = """
+const [selector, quietMs, timeoutMs, done] = arguments;
+const start = performance.now();
+if (!window.__firmScrapeInflight) {
+    window.__firmScrapeInflight = {count: 0};
+    const inflight = window.__firmScrapeInflight;
+    const origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function() {
+            inflight.count++;
+            return origFetch.apply(this, arguments).finally(() => inflight.count--);
+        };
+    }
+    const origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        inflight.count++;
+        this.addEventListener("loadend", () => inflight.count--, {once: true});
+        return origSend.apply(this, arguments);
+    };
+}
+const inflight = window.__firmScrapeInflight;
+let lastChange = performance.now();
+let observer = null;
+let readyAt = null;
+let resourceCount = -1;
+function observe() {
+    let target = document.body || document.documentElement;
+    if (selector) {
+        const match = document.querySelector(selector);
+        if (match && match.parentElement) {
+            target = match.parentElement;
+        }
+    }
+    observer = new MutationObserver(() => { lastChange = performance.now(); });
+    observer.observe(target, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+function check() {
+    const now = performance.now();
+    if (readyAt === null) {
+        if (document.readyState !== "complete") {
+            lastChange = now;
+        } else {
+            readyAt = now;
+            observe();
+        }
+    }
+    const resources = performance.getEntriesByType("resource").length;
+    if (resources !== resourceCount || inflight.count > 0) {
+        resourceCount = resources;
+        lastChange = now;
+    }
+    const timedOut = now - start >= timeoutMs;
+    if ((readyAt !== null && now - lastChange >= quietMs) || timedOut) {
+        if (observer) {
+            observer.disconnect();
+        }
+        done({
+            elapsed: now - start,
+            ready: readyAt === null ? null : readyAt - start,
+            timed_out: timedOut,
+        });
+        return;
+    }
+    setTimeout(check, 50);
+}
+check();
+"""
+
+
+class WaitTimings:
+    """
+    Thread safe record of how long each kind of wait actually took, for tuning WAIT_QUIET_MS and WAIT_TIMEOUT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, kind, seconds, timed_out):
+        with self._lock:
+            stats = self._stats.setdefault(
+                kind, {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0}
+            )
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["timeouts"] += int(timed_out)
+
+    def summary(self):
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+
+wait_timings = WaitTimings()
+
+
+def settle(
+    driver, kind="page", selector=None, timeout=WAIT_TIMEOUT, quiet_ms=WAIT_QUIET_MS
+):
+    """
+    Blocks until the current page has settled: readyState is complete, the network is idle and the DOM around selector (or the whole body) stopped mutating for quiet_ms. Gives up after timeout seconds.
+    """
+    start = time.monotonic()
+    timed_out = False
+    driver.set_script_timeout(timeout + 5)
+    while True:
+        remaining = timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            timed_out = True
+            break
+        try:
+            result = driver.execute_async_script(
+                SETTLE_SCRIPT, selector, quiet_ms, int(remaining * 1000)
+            )
+            timed_out = result["timed_out"]
+            break
+        except WebDriverException as e:
+            # A click that navigates unloads the document under the script;
+            # wait again on the new document.
+            logging.info(f"Settle interrupted, retrying: {e.msg}")
+            time.sleep(0.1)
+    elapsed = time.monotonic() - start
+    wait_timings.record(kind, elapsed, timed_out)
+    logging.info(
+        f"Settled {kind} in {elapsed:.2f}s{' (timed out)' if timed_out else ''}."
+    )
+    return elapsed
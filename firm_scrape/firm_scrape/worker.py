@@ -0,0 +1,93 @@
+import argparse
+import logging
+import os
+import socket
+import threading
+
+import firm_scrape.database
+from firm_scrape.database import db_session
+from .constants import (
+    JOB_LEASE_SECONDS,
+    JOB_POLL_SECONDS,
+    MAX_CONCURRENT_JOBS,
+    WORKER_METRICS_PORT,
+)
+from .jobqueue import claim_job, renew_leases
+from .metrics import serve_metrics
+from .progress import ProgressWriter
+from .scheduler import JobScheduler
+from .names import get_name_index
+
+
+class Worker:
+    """
+    Claims jobs from the queue and runs up to concurrency of them at a time. Runs as its own process, separately from the web app:
+
+        python -m firm_scrape.worker --concurrency 4
+    """
+
+    def __init__(self, concurrency=MAX_CONCURRENT_JOBS):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.scheduler = JobScheduler(concurrency)
+        self._slots = threading.Semaphore(concurrency)
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.progress_writer = ProgressWriter()
+
+    def run(self):
+        name_set = get_name_index()
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        self.progress_writer.start()
+        logging.info(f"Worker {self.worker_id} started.")
+        try:
+            while not self._stopped.is_set():
+                self._slots.acquire()
+                job_id = claim_job(self.worker_id)
+                if job_id is None:
+                    self._slots.release()
+                    self._stopped.wait(JOB_POLL_SECONDS)
+                    continue
+                with self._active_lock:
+                    self._active.add(job_id)
+                future = self.scheduler.submit(job_id, name_set)
+                future.add_done_callback(lambda _, job_id=job_id: self._done(job_id))
+        finally:
+            self._stopped.set()
+            self.scheduler.shutdown()
+            self.progress_writer.stop()
+            db_session.remove()
+
+    def _done(self, job_id):
+        with self._active_lock:
+            self._active.discard(job_id)
+        self.progress_writer.finish(job_id)
+        self._slots.release()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(JOB_LEASE_SECONDS / 3):
+            with self._active_lock:
+                job_ids = list(self._active)
+            try:
+                renew_leases(job_ids, self.worker_id)
+            except Exception as e:
+                logging.error(f"Failed to renew leases: {e}")
+                db_session.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs queued FirmJobs.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_JOBS)
+    parser.add_argument("--metrics-port", type=int, default=WORKER_METRICS_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=20)
+    firm_scrape.database.init_db()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    Worker(args.concurrency).run()
+
+
+if __name__ == "__main__":
+    main()
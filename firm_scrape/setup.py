@@ -4,5 +4,5 @@ setup(
     name="firm_scrape",
     packages=["firm_scrape"],
     include_package_data=True,
-    install_requires=["flask", "undetected-chromedriver"],
+    install_requires=["flask", "undetected-chromedriver", "aiohttp"],
 )
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# firm_scrape reads these on import, so the tests never touch real data.
+_scratch = tempfile.mkdtemp(prefix="firm_scrape_tests_")
+os.environ["FIRM_SCRAPE_DATABASE"] = os.path.join(_scratch, "database.db")
+os.environ["FIRM_SCRAPE_CACHE_DIR"] = os.path.join(_scratch, "cache")
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+NAMES = [
+    "james",
+    "mary",
+    "robert",
+    "patricia",
+    "john",
+    "linda",
+    "david",
+    "susan",
+    "smith",
+    "jones",
+    "brown",
+    "taylor",
+    "wilson",
+    "davies",
+    "evans",
+    "clark",
+]
+
+
+def read_fixture(name):
+    return (FIXTURES / name).read_text()
+
+
+@pytest.fixture
+def name_set():
+    """
+    A stand-in for the name index, with the names the fixtures use.
+    """
+    return set(NAMES)
+
+
+@pytest.fixture
+def serve():
+    """
+    Serves {path and query: fixture file name} on an ephemeral port, and returns the server's url. Anything else is a 404.
+    """
+    servers = []
+
+    def start(routes):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = routes.get(self.path)
+                if name is None:
+                    self.send_error(404)
+                    return
+                body = read_fixture(name).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="session")
+def database():
+    from firm_scrape.database import db_session, init_db
+
+    init_db()
+    yield db_session
+    db_session.remove()
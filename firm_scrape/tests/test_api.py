@@ -0,0 +1,101 @@
+import json
+
+from firm_scrape.api import (
+    api_page_url,
+    find_listing_api,
+    get_records,
+    iter_listing_api,
+    named_count,
+    record_preview,
+)
+
+from .conftest import read_fixture
+
+LISTING_URL = "https://example.com/api/people?page=1&size=4"
+
+
+def test_find_listing_api_picks_the_listing(name_set):
+    responses = [
+        ("https://example.com/api/offices", json.loads(read_fixture("offices.json"))),
+        (LISTING_URL, json.loads(read_fixture("people.json"))),
+    ]
+    url, path, records = find_listing_api(responses, name_set)
+    assert url == LISTING_URL
+    assert path == ["data", "people"]
+    assert len(records) == 4
+    assert named_count(records, name_set) == 4
+
+
+def test_find_listing_api_needs_two_people(name_set):
+    data = {"results": [{"name": "James Smith"}, {"name": "Head Office"}]}
+    assert find_listing_api([(LISTING_URL, data)], name_set) is None
+    assert find_listing_api([], name_set) is None
+
+
+def test_get_records():
+    data = json.loads(read_fixture("people.json"))
+    assert len(get_records(data, ["data", "people"])) == 4
+    assert get_records(data, ["data", "missing"]) == []
+    assert get_records(data, ["data", "total"]) == []
+
+
+def test_api_page_url_moves_the_page_parameter():
+    assert (
+        api_page_url(LISTING_URL, 2, 4)
+        == "https://example.com/api/people?page=3&size=4"
+    )
+    assert api_page_url(LISTING_URL, 0, 4) == LISTING_URL
+
+
+def test_api_page_url_moves_the_offset_parameter():
+    url = "https://example.com/api/people?limit=20&offset=0"
+    assert (
+        api_page_url(url, 3, 20) == "https://example.com/api/people?limit=20&offset=60"
+    )
+
+
+def test_api_page_url_needs_a_page_or_offset():
+    assert api_page_url("https://example.com/api/people", 1, 4) is None
+    assert api_page_url("https://example.com/api/people?page=last", 1, 4) is None
+
+
+def test_record_preview():
+    record = {
+        "firstName": "James",
+        "lastName": "Smith",
+        "title": "Partner",
+        "email": "james.smith@example.com",
+        "profileUrl": "/people/james-smith",
+        "linkedin": "https://www.linkedin.com/in/james-smith",
+        "offices": [{"city": "Boston"}],
+        "active": True,
+        "id": 17,
+    }
+    hrefs, texts = record_preview(record, "https://example.com/team")
+    assert hrefs == [
+        "mailto:james.smith@example.com",
+        "https://example.com/people/james-smith",
+        "https://www.linkedin.com/in/james-smith",
+    ]
+    # the name's parts are not repeated, and booleans are dropped
+    assert texts == ["James Smith", "Partner", "Boston", "17"]
+
+
+def test_iter_listing_api_stops_when_unpaged():
+    records = json.loads(read_fixture("people.json"))["data"]["people"]
+    pages = list(
+        iter_listing_api(
+            "https://example.com/api/people",
+            ["data", "people"],
+            records,
+            "https://example.com/team",
+        )
+    )
+    assert len(pages) == 1
+    url, previews = pages[0]
+    assert url == "https://example.com/api/people"
+    assert previews[0] == [
+        ["https://example.com/people/james-smith"],
+        ["1", "James Smith", "Partner"],
+    ]
+    assert len(previews) == 4
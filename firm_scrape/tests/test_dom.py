@@ -0,0 +1,99 @@
+import pytest
+
+from firm_scrape.dom import DomSnapshot
+from firm_scrape.util import derive_profile_selector, get_name_nodes
+
+from .conftest import read_fixture
+
+
+@pytest.fixture
+def team_page():
+    return DomSnapshot.from_html(read_fixture("team_page.html"))
+
+
+def test_from_html_builds_the_element_tree(team_page):
+    assert team_page.root.tag == "html"
+    assert [child.tag for child in team_page.root.children] == ["head", "body"]
+    card = team_page.select(".profile-card")[0]
+    assert card.classes == ["profile-card", "col"]
+    assert card.parent.classes == ["profile-grid"]
+    assert [child.tag for child in card.children] == ["a", "p", "a"]
+    assert card.children[0].href == "/people/james-smith"
+    assert card.anchor_count == 2
+
+
+def test_from_html_approximates_inner_text(team_page):
+    card = team_page.select(".profile-card")[0]
+    assert card.inner_text == "James Smith\nPartner\nEmail"
+    assert card.children[0].children[0].text == "James Smith"
+    # script and title text is never rendered
+    script = team_page.select("script")[0]
+    assert script.text == ""
+    assert "featured" not in team_page.root.inner_text
+    assert "Smith & Jones LLP" not in team_page.root.inner_text
+
+
+def test_from_html_supplies_what_browsers_do():
+    snapshot = DomSnapshot.from_html("<p>Intro<ul><li>James Smith<li>Mary Jones</ul>")
+    assert snapshot.root.tag == "html"
+    assert [(node.tag, node.parent.tag) for node in snapshot.nodes[1:]] == [
+        ("p", "html"),
+        ("ul", "html"),
+        ("li", "ul"),
+        ("li", "ul"),
+    ]
+
+    table = DomSnapshot.from_html("<table><tr><td>1<td>2<tr><td>3</table>")
+    assert [node.tag for node in table.select("table > tbody > tr")] == ["tr", "tr"]
+    assert [node.inner_text for node in table.select("tr > td")] == ["1", "2", "3"]
+
+
+def test_select(team_page):
+    assert len(team_page.select(".profile-card")) == 4
+    assert len(team_page.select("div.profile-card.col")) == 4
+    assert len(team_page.select("span.profile-card")) == 0
+    names = team_page.select("main > div > div > a > h3")
+    assert [node.text for node in names] == [
+        "James Smith",
+        "Mary Jones",
+        "Robert Brown",
+        "Patricia Taylor",
+    ]
+    # child combinators only match direct children
+    assert team_page.select("div > h3") == []
+    assert len(team_page.select("nav.site-nav > a")) == 3
+
+
+def test_get_name_nodes_skips_hidden_and_repeated_names(team_page, name_set):
+    names = get_name_nodes(team_page, name_set, limit=None)
+    assert [node.text for node in names] == [
+        "James Smith",
+        "Mary Jones",
+        "Robert Brown",
+        "Patricia Taylor",
+    ]
+
+
+def test_derive_profile_selector_from_common_classes(team_page, name_set):
+    selector = derive_profile_selector(team_page, name_set)
+    assert selector == ".profile-card.col"
+    assert len(team_page.select(selector)) == 4
+
+
+def test_derive_profile_selector_from_tag_path(name_set):
+    snapshot = DomSnapshot.from_html(read_fixture("table_page.html"))
+    selector = derive_profile_selector(snapshot, name_set)
+    # the same path a browser's DOM has, tbody included
+    assert selector == "html > body > table > tbody > tr"
+    rows = snapshot.select(selector)
+    assert [row.children[0].inner_text for row in rows[1:]] == [
+        "James Smith",
+        "Mary Jones",
+        "Robert Brown",
+    ]
+
+
+def test_derive_profile_selector_needs_two_names(name_set):
+    snapshot = DomSnapshot.from_html("<div><h3>James Smith</h3><p>Partner</p></div>")
+    with pytest.raises(Exception):
+        derive_profile_selector(snapshot, name_set)
@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+from firm_scrape.models import (
+    ContactPoint,
+    FirmJob,
+    FirmType,
+    PersonalProfile,
+)
+
+
+@pytest.fixture
+def firm_job(database):
+    firm_job = FirmJob(f"{uuid.uuid4().hex}.example.com", FirmType.LAW, 100)
+    database.add(firm_job)
+    database.commit()
+    return firm_job
+
+
+def make_profile(firm_job, *hrefs):
+    profile = PersonalProfile("https://example.com/team", FirmType.LAW, firm_job.id)
+    profile.update_with_hrefs(hrefs)
+    return profile
+
+
+def stored_contacts(database, profile_id):
+    return sorted(
+        (contact_point.kind.name, contact_point.value)
+        for contact_point in database.query(ContactPoint).filter_by(
+            profile_id=profile_id
+        )
+    )
+
+
+def test_save_profiles_stores_each_contact_point_once(firm_job, database):
+    profile = make_profile(
+        firm_job,
+        "mailto:james@example.com",
+        "mailto:james@example.com",
+        "/people/james",
+    )
+    firm_job.save_profiles([profile])
+    # saved again once enriched, as when its full profile page is read
+    profile.update_with_hrefs(
+        ["mailto:james@example.com", "https://www.linkedin.com/in/james"]
+    )
+    firm_job.save_profiles([profile])
+
+    assert stored_contacts(database, profile.id) == [
+        ("EMAIL", "mailto:james@example.com"),
+        ("LINKEDIN", "https://www.linkedin.com/in/james"),
+        ("OTHER", "/people/james"),
+    ]
+
+
+def test_save_profiles_drops_only_the_bad_row(firm_job, database):
+    saved = make_profile(firm_job, "mailto:james@example.com")
+    firm_job.save_profiles([saved])
+
+    clash = make_profile(firm_job, "mailto:mary@example.com")
+    clash.id = saved.id  # fails the bulk insert
+    others = [
+        make_profile(firm_job, "mailto:robert@example.com"),
+        make_profile(firm_job, "mailto:linda@example.com"),
+    ]
+    firm_job.save_profiles([others[0], clash, others[1]])
+
+    stored = database.query(PersonalProfile).filter_by(job_id=firm_job.id).all()
+    assert len(stored) == 3
+    assert stored_contacts(database, others[1].id) == [
+        ("EMAIL", "mailto:linda@example.com")
+    ]
+    assert stored_contacts(database, saved.id) == [
+        ("EMAIL", "mailto:james@example.com")
+    ]
@@ -0,0 +1,27 @@
+import json
+import uuid
+
+from firm_scrape.events import EventBus
+from firm_scrape.models import FirmJob, FirmType
+from firm_scrape.progress import ProgressWriter
+
+
+def test_progress_writer_forgets_finished_jobs(database):
+    firm_job = FirmJob(f"{uuid.uuid4().hex}.example.com", FirmType.LAW, 100)
+    database.add(firm_job)
+    database.commit()
+    bus = EventBus()
+    writer = ProgressWriter(bus)
+    writer._subscriber = bus.subscribe("progress")
+
+    bus.publish("progress", {"id": firm_job.id, "strategy": "static"})
+    writer.flush()
+    # the job's last event is still queued when it finishes
+    bus.publish("progress", {"id": firm_job.id, "profiles": 4})
+    writer.finish(firm_job.id)
+    writer.flush()
+
+    database.expire_all()
+    stored = database.get(FirmJob, firm_job.id)
+    assert json.loads(stored.progress) == {"strategy": "static", "profiles": 4}
+    assert writer._progress == {}
@@ -0,0 +1,95 @@
+from firm_scrape.dom import DomSnapshot
+from firm_scrape.static import (
+    find_next_page_href,
+    harvest_static_previews,
+    iter_prefetched_pages,
+    paged_url,
+)
+
+from .conftest import read_fixture
+
+PAGES = {
+    "/team": "team_page.html",
+    "/team?page=2": "team_page_2.html",
+    "/team?page=3": "team_page_3.html",
+}
+
+
+def test_harvest_static_previews():
+    snapshot = DomSnapshot.from_html(read_fixture("team_page.html"))
+    previews = harvest_static_previews(snapshot, ".profile-card")
+    assert len(previews) == 4
+    assert previews[0] == [
+        ["/people/james-smith", "mailto:james.smith@example.com"],
+        ["James Smith", "Partner", "Email"],
+    ]
+
+
+def test_find_next_page_href():
+    snapshot = DomSnapshot.from_html(read_fixture("team_page.html"))
+    assert find_next_page_href(snapshot, 1) == "/team?page=2"
+    assert find_next_page_href(snapshot, 3) is None
+
+
+def test_paged_url_rewrites_the_page_parameter():
+    url = "https://example.com/team?office=boston&page=2"
+    assert paged_url(url, 2, 5) == "https://example.com/team?office=boston&page=5"
+    # only a parameter holding the page's own number
+    assert paged_url(url, 3, 5) is None
+
+
+def test_paged_url_rewrites_the_page_path_segment():
+    assert (
+        paged_url("https://example.com/team/page/2/", 2, 4)
+        == "https://example.com/team/page/4/"
+    )
+    assert paged_url("https://example.com/team/page/20", 2, 4) is None
+
+
+def test_paged_url_needs_a_page_number():
+    assert paged_url("https://example.com/team", 1, 2) is None
+    assert paged_url("https://example.com/team?office=2", 2, 3) is None
+
+
+def test_iter_prefetched_pages_until_the_last_page(serve):
+    base = serve(PAGES)
+    pages = list(
+        iter_prefetched_pages(f"{base}/team?page=2", 2, ".profile-card", 4, 100)
+    )
+    assert [url for url, _ in pages] == [f"{base}/team?page=2", f"{base}/team?page=3"]
+    assert [len(previews) for _, previews in pages] == [4, 2]
+
+
+def test_iter_prefetched_pages_stops_at_a_repeated_page(serve):
+    # some sites serve their last page again past the end
+    base = serve(dict(PAGES, **{"/team?page=4": "team_page_3.html"}))
+    pages = list(
+        iter_prefetched_pages(f"{base}/team?page=2", 2, ".profile-card", 4, 100)
+    )
+    assert len(pages) == 2
+
+
+def test_iter_prefetched_pages_fetches_only_what_is_needed(serve):
+    base = serve(PAGES)
+    pages = list(iter_prefetched_pages(f"{base}/team?page=2", 2, ".profile-card", 4, 3))
+    assert [url for url, _ in pages] == [f"{base}/team?page=2"]
+
+
+def test_iter_prefetched_pages_for_an_unlimited_job(serve):
+    # a job submitted without a limit has float("inf") as its limit
+    base = serve(PAGES)
+    pages = list(
+        iter_prefetched_pages(
+            f"{base}/team?page=2", 2, ".profile-card", 4, float("inf")
+        )
+    )
+    assert [len(previews) for _, previews in pages] == [4, 2]
+
+
+def test_iter_prefetched_pages_yields_nothing_unless_paged_by_url(serve):
+    base = serve(PAGES)
+    assert list(iter_prefetched_pages(f"{base}/team", 2, ".profile-card", 4, 100)) == []
+    # a page without previews, as when the listing is rendered by javascript
+    assert (
+        list(iter_prefetched_pages(f"{base}/team?page=2", 2, ".missing", 4, 100)) == []
+    )
@@ -0,0 +1,555 @@
+# Offline benchmark of the scraping strategies.
+#
+# Serves snapshots of firm websites from local HTTP servers, one per site, and
+# runs real FirmJobs against them in Chrome. For each site it reports the wall
+# time, WebDriver round trips, bytes fetched over HTTP, peak memory and the
+# profiles and emails extracted, as JSON tagged with the commit, so runs on
+# different commits can be compared:
+#
+#   python scripts/benchmark.py --output before.json
+#   git checkout my-branch
+#   python scripts/benchmark.py --output after.json --compare before.json
+#
+# Without --snapshots, four synthetic sites modelled on common team page
+# layouts are served: a paginated directory, a select-filtered directory, a
+# search-box directory and a site only reachable through its sitemap.
+# --save-snapshots writes them out in the snapshot layout: one directory per
+# site, in which the page at /path?query is saved as path?query/index.html,
+# other files (robots.txt, sitemaps) under their own path, and an optional
+# site.json holds the job's firm_type and limit. Recorded sites saved in that
+# layout can be replayed with --snapshots.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib import parse
+
+ROOT = Path(__file__).resolve().parents[1]
+PACKAGE_DIR = ROOT / "firm_scrape"
+
+FIRST_NAMES = [
+    "James",
+    "Mary",
+    "Robert",
+    "Patricia",
+    "John",
+    "Jennifer",
+    "Michael",
+    "Linda",
+    "David",
+    "Elizabeth",
+]
+LAST_NAMES = [
+    "Smith",
+    "Johnson",
+    "Williams",
+    "Davis",
+    "Wilson",
+    "Moore",
+    "Taylor",
+    "Thomas",
+]
+TITLES = ["Partner", "Associate", "Counsel", "Paralegal"]
+# all but the last are key practices, which the filters and searches look for
+PRACTICES = ["Venture Capital", "Private Equity", "Intellectual Property", "Litigation"]
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body>
+<nav><a href="/">Home</a> <a href="/about">About</a> {nav}</nav>
+<main>
+{body}
+</main>
+<footer><a href="/privacy">Privacy</a></footer>
+</body></html>
+"""
+
+
+def people(count, offset=0):
+    """
+    count distinct (name, slug, title) tuples, the same on every run.
+    """
+    result = []
+    for i in range(offset, offset + count):
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        name = f"{first} {last}"
+        result.append((name, f"{first}-{last}".lower(), TITLES[i % len(TITLES)]))
+    return result
+
+
+def practice(index):
+    """
+    The practice of the person people() made at index, spread over the titles.
+    """
+    return PRACTICES[(index // len(TITLES)) % len(PRACTICES)]
+
+
+def card(name, slug, title, with_email):
+    email = f'<a href="mailto:{slug}@example.com">Email</a>' if with_email else ""
+    return (
+        f'<div class="profile-card"><a href="/people/{slug}"><h3>{name}</h3></a>'
+        f'<p class="title">{title}</p>{email}</div>'
+    )
+
+
+def grid(persons):
+    # every other preview lacks an email, so its bio page has to be fetched
+    cards = "\n".join(
+        card(name, slug, title, i % 2 == 0)
+        for i, (name, slug, title) in enumerate(persons)
+    )
+    return f'<div class="profile-grid">\n{cards}\n</div>'
+
+
+def bio_pages(persons):
+    return {
+        f"/people/{slug}": PAGE.format(
+            title=name,
+            nav="",
+            body=(
+                f"<h1>{name}</h1><p>{title}</p>"
+                f'<a href="mailto:{slug}@example.com">{slug}@example.com</a> '
+                f'<a href="https://www.linkedin.com/in/{slug}">LinkedIn</a>'
+            ),
+        )
+        for name, slug, title in persons
+    }
+
+
+def homepage(nav):
+    return PAGE.format(title="Home", nav=nav, body="<h1>Welcome</h1><p>A firm.</p>")
+
+
+def paginated_site():
+    pages = [people(20, offset) for offset in (0, 20, 40)]
+    site = {"/": homepage('<a href="/team">Our Team</a>')}
+    for index, persons in enumerate(pages, start=1):
+        links = " ".join(
+            f'<a href="/team?page={number}">{number}</a>'
+            for number in range(1, len(pages) + 1)
+            if number != index
+        )
+        site["/team" if index == 1 else f"/team?page={index}"] = PAGE.format(
+            title="Our Team", nav="", body=f"{grid(persons)}\n<div>{links}</div>"
+        )
+        site.update(bio_pages(persons))
+    return site, {"firm_type": "LAW", "limit": 1000, "expected_profiles": 60}
+
+
+def select_site():
+    persons = people(40)
+    form = (
+        '<form action="/people" method="get">'
+        '<select name="title"><option value="">Any title</option>'
+        + "".join(f"<option>{title}</option>" for title in TITLES)
+        + '</select><select name="practice"><option value="">Any practice</option>'
+        + "".join(f"<option>{name}</option>" for name in PRACTICES)
+        + '</select><button type="submit" class="search-button">Search</button></form>'
+    )
+    prompt = "<p>Choose a title or a practice to see our people.</p>"
+    site = {
+        "/": homepage('<a href="/people">People</a>'),
+        "/people": PAGE.format(title="People", nav="", body=f"{form}\n{prompt}"),
+    }
+    # the listing is only rendered for a filter, so the static engine finds
+    # nobody and the job has to apply the selects in the browser
+    for title in [""] + TITLES:
+        for name in [""] + PRACTICES:
+            if not title and not name:
+                continue
+            matches = [
+                person
+                for index, person in enumerate(persons)
+                if title in ("", person[2]) and name in ("", practice(index))
+            ]
+            site[f"/people?title={title}&practice={name}"] = PAGE.format(
+                title="People", nav="", body=f"{form}\n{grid(matches)}"
+            )
+    site.update(bio_pages(persons))
+    # one search per key practice among the partners, sharded over the drivers
+    expected = sum(
+        1
+        for index, person in enumerate(persons)
+        if person[2] == "Partner" and practice(index) in PRACTICES[:-1]
+    )
+    return site, {"firm_type": "LAW", "limit": 1000, "expected_profiles": expected}
+
+
+def search_box_site():
+    persons = people(25)
+    form = (
+        '<form action="/attorneys" method="get">'
+        '<input type="text" name="q" class="search-input" placeholder="Search">'
+        "</form>"
+    )
+    prompt = "<p>Search our attorneys by name or practice.</p>"
+    site = {
+        "/": homepage('<a href="/attorneys">Attorneys</a>'),
+        "/attorneys": PAGE.format(title="Attorneys", nav="", body=f"{form}\n{prompt}"),
+    }
+    # results are only rendered for a search, so the static engine finds
+    # nobody and the job has to type into the search box in the browser
+    for name in PRACTICES:
+        matches = [
+            person for index, person in enumerate(persons) if practice(index) == name
+        ]
+        site[f"/attorneys?q={name.lower()}"] = PAGE.format(
+            title="Attorneys", nav="", body=f"{form}\n{grid(matches)}"
+        )
+    site.update(bio_pages(persons))
+    # one search per key practice, each returning that practice's attorneys
+    expected = sum(
+        1 for index in range(len(persons)) if practice(index) in PRACTICES[:-1]
+    )
+    return site, {"firm_type": "LAW", "limit": 1000, "expected_profiles": expected}
+
+
+def sitemap_site():
+    persons = people(40)
+    site = {
+        "/": homepage(""),
+        "/robots.txt": "User-agent: *\nSitemap: {base}/sitemap.xml\n",
+    }
+    site.update(bio_pages(persons))
+    urls = "".join(
+        f"<url><loc>{{base}}{path}</loc></url>"
+        for path in sorted(site)
+        if path != "/robots.txt"
+    )
+    site["/sitemap.xml"] = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    )
+    return site, {"firm_type": "LAW", "limit": 1000, "expected_profiles": 40}
+
+
+SYNTHETIC_SITES = {
+    "paginated": paginated_site,
+    "select": select_site,
+    "search_box": search_box_site,
+    "sitemap": sitemap_site,
+}
+
+
+def save_snapshot(directory, pages, config):
+    directory.mkdir(parents=True, exist_ok=True)
+    for path, content in pages.items():
+        relative = path.strip("/")
+        if "." not in relative.rsplit("/", 1)[-1]:
+            relative = f"{relative}/index.html".lstrip("/")
+        target = directory / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content)
+    (directory / "site.json").write_text(json.dumps(config, indent=2))
+
+
+def load_snapshot(directory):
+    pages = {}
+    for file in directory.rglob("*"):
+        if not file.is_file() or file.name == "site.json":
+            continue
+        path = "/" + file.relative_to(directory).as_posix()
+        if path.endswith("/index.html"):
+            path = path[: -len("/index.html")] or "/"
+        pages[path] = file.read_text()
+    config_file = directory / "site.json"
+    config = json.loads(config_file.read_text()) if config_file.exists() else {}
+    return pages, config
+
+
+def content_type(path):
+    if path.endswith(".xml"):
+        return "application/xml"
+    if path.endswith(".txt"):
+        return "text/plain"
+    return "text/html; charset=utf-8"
+
+
+def serve(pages):
+    """
+    Serves pages on an ephemeral port in a background thread. An exact match of the path and the unquoted query wins, then the path alone, so filters and searches without a page of their own get the base page. {base} in a page is replaced by the server's own url.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = parse.unquote_plus(self.path)
+            content = pages.get(path)
+            if content is None:
+                path = self.path.split("?")[0]
+                content = pages.get(path)
+            if content is None:
+                self.send_error(404)
+                return
+            body = content.replace("{base}", base).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type(path))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    base = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class PeakMemory:
+    """
+    Samples the RSS of the browser's process tree while running, and reports the peak along with this process's peak.
+    """
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stopped = threading.Event()
+
+    def __enter__(self):
+        from firm_scrape.drivers import get_process_tree_rss
+
+        def sample():
+            while not self._stopped.wait(self.interval):
+                self.peak = max(self.peak, get_process_tree_rss(self.pid))
+
+        self._thread = threading.Thread(target=sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def run_site(name, pages, config, driver_pool, browser_pid, name_set):
+    from firm_scrape.database import db_session
+    from firm_scrape.metrics import job_metrics
+    from firm_scrape.models import (
+        ContactKind,
+        ContactPoint,
+        FirmJob,
+        FirmType,
+        PersonalProfile,
+    )
+
+    # a new port, and so a new domain, for every run: nothing is cached
+    server = serve(pages)
+    domain = f"127.0.0.1:{server.server_port}"
+    try:
+        firm_job = FirmJob(
+            domain, FirmType[config.get("firm_type", "LAW")], config.get("limit", 1000)
+        )
+        db_session.add(firm_job)
+        db_session.commit()
+
+        with job_metrics() as timings:
+            with PeakMemory(browser_pid) as memory:
+                start = time.monotonic()
+                firm_job.execute(name_set, driver_pool)
+                wall = time.monotonic() - start
+        db_session.commit()
+
+        summary = timings.summary()
+        profiles = PersonalProfile.query.filter_by(job_id=firm_job.id).count()
+        emails = (
+            db_session.query(ContactPoint)
+            .join(PersonalProfile, ContactPoint.profile_id == PersonalProfile.id)
+            .filter(
+                PersonalProfile.job_id == firm_job.id,
+                ContactPoint.kind == ContactKind.EMAIL,
+            )
+            .count()
+        )
+        return {
+            "wall_seconds": wall,
+            "webdriver_commands": summary["counters"].get(
+                "webdriver_commands_total", 0
+            ),
+            "webdriver_seconds": summary["counters"].get("webdriver_seconds_total", 0),
+            "browser": "browser" in summary["spans"],
+            "fetched_bytes": summary["counters"].get("fetched_bytes_total", 0),
+            "peak_browser_rss_mb": memory.peak / 2**20,
+            "profiles": profiles,
+            "expected_profiles": config.get("expected_profiles"),
+            "emails": emails,
+            "failed": bool(firm_job.failed),
+            "fail_reason": firm_job.fail_reason if firm_job.failed else None,
+            "spans": summary["spans"],
+        }
+    finally:
+        db_session.remove()
+        server.shutdown()
+
+
+def summarize(runs):
+    """
+    The median of each numeric result over repeated runs, the other results of the last run.
+    """
+    result = dict(runs[-1])
+    for key, value in runs[-1].items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[key] = statistics.median(run[key] for run in runs)
+    result["runs"] = len(runs)
+    return result
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+        dirty = bool(
+            subprocess.check_output(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=ROOT,
+                text=True,
+            ).strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(results, baseline):
+    keys = [
+        "wall_seconds",
+        "webdriver_commands",
+        "fetched_bytes",
+        "peak_browser_rss_mb",
+        "profiles",
+        "emails",
+    ]
+    print(f"Compared to {baseline.get('commit')}:")
+    for site, result in results["sites"].items():
+        before = baseline["sites"].get(site)
+        if before is None:
+            continue
+        changes = []
+        for key in keys:
+            old, new = before.get(key), result.get(key)
+            if old is None or new is None:
+                continue
+            delta = f" ({(new - old) / old:+.0%})" if old else ""
+            changes.append(f"{key} {old:.4g} -> {new:.4g}{delta}")
+        print(f"  {site}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks FirmJob strategies offline."
+    )
+    parser.add_argument(
+        "--snapshots", type=Path, help="directory of recorded sites to replay"
+    )
+    parser.add_argument("--sites", nargs="*", help="only run these sites")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--drivers",
+        type=int,
+        default=2,
+        help="size of the driver pool, more than one lets search configurations shard",
+    )
+    parser.add_argument("--output", type=Path, help="write the results here as JSON")
+    parser.add_argument(
+        "--compare", type=Path, help="results of an earlier run to compare to"
+    )
+    parser.add_argument(
+        "--save-snapshots", type=Path, help="write the synthetic sites here and exit"
+    )
+    args = parser.parse_args()
+
+    if args.snapshots:
+        sites = {
+            directory.name: (lambda directory=directory: load_snapshot(directory))
+            for directory in sorted(args.snapshots.iterdir())
+            if directory.is_dir()
+        }
+    else:
+        sites = dict(SYNTHETIC_SITES)
+    if args.sites:
+        sites = {name: sites[name] for name in args.sites}
+
+    if args.save_snapshots:
+        for name, build in sites.items():
+            save_snapshot(args.save_snapshots / name, *build())
+        return
+
+    # A scratch database and cache, so benchmarks never touch real data. These
+    # must be set before firm_scrape is imported.
+    scratch = tempfile.mkdtemp(prefix="firm_scrape_benchmark_")
+    os.environ["FIRM_SCRAPE_DATABASE"] = os.path.join(scratch, "database.db")
+    os.environ["FIRM_SCRAPE_CACHE_DIR"] = os.path.join(scratch, "cache")
+    os.chdir(PACKAGE_DIR)  # the name files are found relative to it
+    sys.path.insert(0, str(PACKAGE_DIR))
+
+    from firm_scrape.database import init_db
+    from firm_scrape.drivers import DriverPool
+    from firm_scrape.names import get_name_index
+
+    init_db()
+    name_set = get_name_index()
+    # The Chrome is started up front, so its startup is timed on its own and
+    # its memory can be sampled, and then reused by the sites that need it.
+    # Helper drivers for sharded searches start when first leased.
+    driver_pool = DriverPool(args.drivers)
+    start = time.monotonic()
+    with driver_pool.lease() as driver:
+        browser_pid = getattr(driver, "browser_pid", None)
+    driver_startup = time.monotonic() - start
+
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "driver_startup_seconds": driver_startup,
+        "sites": {},
+    }
+    try:
+        for name, build in sites.items():
+            pages, config = build()
+            runs = []
+            for _ in range(args.repeat):
+                runs.append(
+                    run_site(name, pages, config, driver_pool, browser_pid, name_set)
+                )
+            results["sites"][name] = summarize(runs)
+            result = results["sites"][name]
+            print(
+                f"{name}: {result['wall_seconds']:.2f}s, "
+                f"{result['webdriver_commands']:.0f} round trips, "
+                f"{result['fetched_bytes'] / 1024:.0f} KiB fetched, "
+                f"{result['profiles']} profiles ({result['expected_profiles']} expected), "
+                f"{result['emails']} emails"
+                + (", in the browser" if result["browser"] else "")
+            )
+    finally:
+        driver_pool.close()
+    results["peak_python_rss_mb"] = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    )
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -27,8 +27,9 @@ async def main(urls):
 
 
 with open(loc, "r") as f:
-    asyncio.run(main(f.read().splitlines()))
+    domains = f.read().splitlines()
+asyncio.run(main(domains))
 
 end = time.time()
 
-print("Took {} seconds to pull {} websites.".format(end - start, len(urls)))
+print("Took {} seconds to pull {} websites.".format(end - start, len(domains)))